@@ -0,0 +1,85 @@
+"""Check the monthly month-spine query against the per-month query it replaced, and time both.
+
+Runs the previous correlated per-month form of ``asin_usage_monthly`` (the
+query ``asin_usage_daily`` still runs for each day, bound to the first day
+of each month) and the current month-spine query, plain and precomputed,
+over one range against the database configured in ``.env`` (Redshift or a
+local Postgres stand-in). Every month must produce the same rows in the
+same order. It also lists months missing from ``api_app_calendar``, which
+the spine cannot produce rows for. Exits with status 1 on any difference.
+
+    python benchmarks/bench_monthly_spine.py --from 2023-01-01 --to 2023-12-31
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import groupby
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export import Exporter, Period, get_report, periods  # noqa: E402
+from redshift_export.connection import ConnectionManager  # noqa: E402
+from redshift_export.reports.asin_usage_daily import QUERY as PER_MONTH_QUERY  # noqa: E402
+
+CALENDAR_MONTHS = """SELECT DISTINCT date_trunc('month', date::timestamp) AS month_start
+FROM api_app_calendar
+WHERE date >= %(start_date)s
+  AND date <= %(end_date)s"""
+
+
+def fetch(conn, query, params):
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        columns = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
+    conn.rollback()
+    return time.perf_counter() - started, columns, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=datetime(2023, 1, 1))
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=datetime(2023, 12, 31))
+    args = parser.parse_args()
+
+    report = get_report("asin_usage_monthly")
+    months = periods(report.cadence, args.start.replace(day=1), args.end)
+    params = report.params(Period(months[0].start, months[-1].end))
+    connections = ConnectionManager.from_env()
+    exporter = Exporter(report, connections=connections, precompute=True)
+    failed = False
+    with connections.connection() as conn:
+        _, _, calendar = fetch(conn, CALENDAR_MONTHS, params)
+        covered = {month_start for (month_start,) in calendar}
+        missing = [month.label for month in months if month.start not in covered]
+        if missing:
+            failed = True
+            print(f"api_app_calendar has no days in {', '.join(missing)}, the spine exports no rows for them")
+
+        per_month = {}
+        per_month_seconds = 0.0
+        for month in months:
+            seconds, columns, rows = fetch(conn, PER_MONTH_QUERY, {"date": month.start})
+            per_month_seconds += seconds
+            per_month[month.start] = rows
+        print(f"per-month query      {per_month_seconds:>8.2f}s for {len(months)} months")
+
+        connections.prepare(conn, exporter.session_tables)
+        for label, query in (("spine query", report.query), ("precomputed spine", exporter.query)):
+            seconds, columns, rows = fetch(conn, query, params)
+            index = columns.index(report.split_column)
+            spine = {month_start: list(group) for month_start, group in groupby(rows, key=lambda row: row[index])}
+            different = [month.label for month in months if spine.get(month.start, []) != per_month[month.start]]
+            failed = failed or bool(different)
+            result = f"differs in {', '.join(different)}" if different else "identical rows and order"
+            print(f"{label:<20} {seconds:>8.2f}s, {result}")
+    connections.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
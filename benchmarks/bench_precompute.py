@@ -0,0 +1,68 @@
+"""Time report queries per date with and without the precomputed session tables.
+
+Runs every report with session tables to precompute (a ``precomputed_query``
+or date-invariant CTEs) for a sample of dates
+against the database configured in ``.env`` (Redshift or a local Postgres
+stand-in). It prints the one-off cost of building the session tables and
+the median/max per-date query time of both forms.
+
+    python benchmarks/bench_precompute.py --from 2024-01-01 --to 2024-03-31 --every 7
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export import REPORTS, Exporter, periods  # noqa: E402
+from redshift_export.connection import ConnectionManager  # noqa: E402
+
+
+def time_query(conn, query, params):
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        cursor.fetchall()
+    conn.rollback()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=datetime(2024, 1, 31))
+    parser.add_argument("--every", type=int, default=7, help="benchmark every n-th period of the range")
+    parser.add_argument("--report", action="append", help="report to benchmark (default: all that precompute)")
+    args = parser.parse_args()
+
+    connections = ConnectionManager.from_env()
+    exporters = {
+        name: Exporter(report, connections=connections, precompute=True) for name, report in REPORTS.items()
+    }
+    names = args.report or sorted(name for name, exporter in exporters.items() if exporter.session_tables)
+    print(f"{'report':<28} {'setup s':>8} {'before p50':>11} {'before max':>11} {'after p50':>10} {'after max':>10}")
+    with connections.connection() as conn:
+        for name in names:
+            report = REPORTS[name]
+            exporter = exporters[name]
+            sample = periods(report.cadence, args.start, args.end)[:: args.every]
+
+            started = time.perf_counter()
+            connections.prepare(conn, exporter.session_tables)
+            setup = time.perf_counter() - started
+
+            before = [time_query(conn, report.query, report.params(period)) for period in sample]
+            after = [time_query(conn, exporter.query, report.params(period)) for period in sample]
+            print(
+                f"{name:<28} {setup:>8.2f} {statistics.median(before):>11.3f} {max(before):>11.3f} "
+                f"{statistics.median(after):>10.3f} {max(after):>10.3f}"
+            )
+    connections.close()
+
+
+if __name__ == "__main__":
+    main()
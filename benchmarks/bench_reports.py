@@ -0,0 +1,128 @@
+"""Time every report end-to-end against a local Postgres stand-in for Redshift.
+
+Exports each report over ``--from`` to ``--to`` into a temporary directory
+and prints wall time, rows and throughput, followed by each run's phase
+summary. By default the database configured in ``.env`` is used. With
+``--pgserver DIR`` a throwaway Postgres is started in DIR instead, which
+needs the optional ``pgserver`` package (pip install pgserver). ``--load``
+fills the database with ``synthetic.py`` data first.
+
+Save a run with ``--save`` and check a later one against it with
+``--compare``. The script exits with status 1 when a report got slower
+than the baseline by more than ``--tolerance``.
+
+    python benchmarks/bench_reports.py --pgserver /tmp/bench-pg --load --scale 1 --save baseline.json
+    python benchmarks/bench_reports.py --pgserver /tmp/bench-pg --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export import REPORTS, AsyncExporter, Exporter  # noqa: E402
+from redshift_export.connection import ConnectionManager  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+
+def start_pgserver(directory):
+    """Start a local Postgres in ``directory``, stopped when the script exits, and point the DB_* settings at it."""
+    try:
+        import pgserver
+    except ImportError as e:
+        raise RuntimeError("--pgserver needs the pgserver package (pip install pgserver)") from e
+    pgserver.get_server(directory)
+    os.environ.update(DB_NAME="postgres", DB_USER="postgres", DB_PASSWORD="", DB_HOST=directory, DB_PORT="5432")
+
+
+def bench_report(report, start, end, workers, precompute, engine):
+    with tempfile.TemporaryDirectory() as exports_dir:
+        connections = ConnectionManager.from_env(max_connections=workers)
+        exporter_class = AsyncExporter if engine == "async" else Exporter
+        exporter = exporter_class(
+            report, workers=workers, exports_dir=exports_dir, connections=connections, precompute=precompute
+        )
+        started = time.perf_counter()
+        exporter.run(start, end)
+        seconds = time.perf_counter() - started
+        connections.close()
+    summary = exporter.metrics.summary()
+    return {
+        "seconds": round(seconds, 3),
+        "windows": summary["windows"],
+        "rows": summary["rows"],
+        "bytes": summary["bytes"],
+        "phases": summary["phases"],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each report's change against ``baseline`` and return the names of those that regressed."""
+    regressed = []
+    print(f"\n{'report':<28} {'baseline s':>10} {'now s':>8} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["seconds"]
+        change = result["seconds"] / before - 1 if before else 0.0
+        flag = ""
+        if change > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<28} {before:>10.3f} {result['seconds']:>8.3f} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=datetime(2024, 1, 31))
+    parser.add_argument("--report", action="append", help="report to benchmark (default: all)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("--precompute", action="store_true", help="export with precomputed session tables")
+    parser.add_argument("--pgserver", metavar="DIR", help="start a local Postgres in DIR instead of using .env")
+    parser.add_argument("--load", action="store_true", help="generate synthetic data before benchmarking")
+    parser.add_argument("--scale", type=float, default=1.0, help="synthetic data scale for --load")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against --compare")
+    args = parser.parse_args()
+
+    if args.pgserver:
+        start_pgserver(args.pgserver)
+    if args.load:
+        connections = ConnectionManager.from_env()
+        with connections.connection() as conn:
+            generate(conn, args.start, args.end, args.scale)
+        connections.close()
+
+    results = {}
+    for name in args.report or sorted(REPORTS):
+        results[name] = bench_report(
+            REPORTS[name], args.start, args.end, args.workers, args.precompute, args.engine
+        )
+
+    print(f"\n{'report':<28} {'seconds':>8} {'windows':>8} {'rows':>9} {'rows/s':>9}")
+    for name, result in results.items():
+        rate = result["rows"] / result["seconds"] if result["seconds"] else 0.0
+        print(f"{name:<28} {result['seconds']:>8.3f} {result['windows']:>8} {result['rows']:>9} {rate:>9.0f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    regressed = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
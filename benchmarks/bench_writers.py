@@ -0,0 +1,93 @@
+"""Compare write throughput and file size of the export output formats.
+
+Writes the same synthetic rows, shaped like the daily organization report,
+through every writer and prints rows/s, MB/s of output and size relative to
+plain CSV. Formats whose optional dependency is missing are skipped.
+
+    python benchmarks/bench_writers.py --rows 200000 --levels 1,6,9
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export.writers import COMPRESSED_FORMATS, WRITERS, Column, get_writer  # noqa: E402
+
+
+def synthetic_report(rows, seed=0):
+    rng = random.Random(seed)
+    description = [
+        Column("day", 1114, None, None, None, None, None),
+        Column("organization_id", 1043, None, None, None, None, None),
+        Column("organization_name", 1043, None, None, None, None, None),
+        Column("organization_locked", 23, None, None, None, None, None),
+        Column("billing_entity_id", 1043, None, None, None, None, None),
+    ]
+    description += [Column(f"metric_{i}", 1700, None, None, None, None, None) for i in range(30)]
+    description += [Column("asin_usage", 20, None, None, None, None, None)]
+
+    day = datetime(2024, 1, 1)
+    data = []
+    for i in range(rows):
+        org = f"org-{i:08d}"
+        row = [day, org, f"Organization {rng.randrange(100000)}", rng.randrange(2), f"agency-{i % 997:05d}"]
+        row += [Decimal(rng.randrange(1000)) if rng.random() > 0.3 else None for _ in range(30)]
+        row += [rng.randrange(5000)]
+        data.append(tuple(row))
+    return description, data
+
+
+def batched(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def bench(output_format, level, description, rows, fetch_size, directory):
+    extension, write = get_writer(output_format, level)
+    filename = os.path.join(directory, f"bench_{output_format}_{level}{extension}")
+    started = time.perf_counter()
+    write(filename, description, batched(rows, fetch_size))
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--fetch-size", type=int, default=10000)
+    parser.add_argument("--levels", default="1,6", help="comma-separated compression levels for gzip/zstd")
+    args = parser.parse_args()
+
+    description, rows = synthetic_report(args.rows)
+    levels = [int(level) for level in args.levels.split(",")]
+    runs = [(output_format, None) for output_format in WRITERS if output_format not in COMPRESSED_FORMATS]
+    runs += [(output_format, level) for output_format in COMPRESSED_FORMATS for level in levels]
+
+    baseline = None
+    print(f"{'format':<10} {'level':>5} {'seconds':>8} {'rows/s':>10} {'MB/s':>8} {'MB':>8} {'vs csv':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for output_format, level in runs:
+            try:
+                elapsed, size = bench(output_format, level, description, rows, args.fetch_size, directory)
+            except RuntimeError as e:
+                print(f"{output_format:<10} skipped: {e}")
+                continue
+            baseline = baseline or size
+            print(
+                f"{output_format:<10} {level if level is not None else '-':>5} {elapsed:>8.2f} "
+                f"{len(rows) / elapsed:>10.0f} {size / elapsed / 1e6:>8.1f} {size / 1e6:>8.1f} "
+                f"{size / baseline:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
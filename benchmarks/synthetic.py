@@ -0,0 +1,207 @@
+"""Create the tables the reports read and fill them with synthetic data.
+
+Builds a Postgres stand-in for the Redshift schema, with every table and
+column the four reports use, and generates rows server-side with
+``generate_series``. The data covers ``--from`` to ``--to`` and grows
+linearly with ``--scale``. The same seed always produces the same data.
+Existing tables are dropped, so never point this at a real warehouse.
+
+    python benchmarks/synthetic.py --scale 2 --from 2024-01-01 --to 2024-03-31
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export.connection import ConnectionManager  # noqa: E402
+
+TABLES = {
+    "auth_permission": "id int, codename varchar",
+    "api_app_organization": (
+        "id varchar primary key, name varchar, salesforce_id varchar, agency_id varchar, asin_cap int, "
+        "enabled varchar, locked int, created_date timestamp, sov_keyword_cap int, ad_account_cap int, "
+        "dashboard_cap int, user_cap int"
+    ),
+    "api_app_organization_permissions": "organization_id varchar, permission_id int",
+    "api_app_organizationgroup_permissions": "organizationgroup_id varchar, permission_id int",
+    "api_app_organization_members": "organization_id varchar, user_id int",
+    "api_app_segment": "id int primary key, organization_id varchar, enabled int, is_demo int, cobalt_segment_id varchar",
+    "api_app_segment_version": (
+        "version_id int primary key, segment_id int, product_id varchar, created_at timestamp, "
+        "inactive_at timestamp, paused_at timestamp"
+    ),
+    "api_app_profile": "id int primary key, country_code varchar",
+    "api_app_account_integration": "id int primary key, organization_id varchar, active_int int, updated_at timestamp",
+    "api_app_account_integration_profiles": (
+        "id int, account_integration_id int, profile_id int, status varchar, selected_status varchar, "
+        "updated_at timestamp"
+    ),
+    "api_app_campaign": "id int primary key, profile_id int",
+    "api_app_dsp_advertiser": "id int, profile_id int",
+    "api_app_calendar": "date date primary key",
+    "api_app_currency_conversion": "date date, from_currency_id varchar, to_currency_id varchar, rate numeric(18, 6)",
+    "api_app_campaign_fact_redshift": (
+        "report_date date, campaign_id int, combined_attributed_sales_14_day numeric(18, 4), cost numeric(18, 4), "
+        "currency_code_id varchar"
+    ),
+    "api_app_automation_task": "organization_id varchar, enabled_int int, capability_id varchar, updated_at timestamp",
+    "api_app_seller_central_account": "id int, integration_type varchar, country varchar, region varchar",
+    "api_app_seller_central_account_integration": (
+        "organization_id varchar, seller_central_account_id int, updated_at timestamp"
+    ),
+    "api_app_sov_keyword": "id int, downstream_managed boolean",
+    "api_app_sov_keyword_subscription": (
+        "organization_id varchar, keyword_id int, subscription_state varchar, updated_date timestamp"
+    ),
+    "api_app_rulebook": "organization_id varchar, updated_at timestamp",
+    "api_app_dashboard": "organization_id varchar, updated_at timestamp",
+}
+
+# Stand-ins for the Redshift sort keys the reports filter on
+INDEXES = [
+    "CREATE INDEX ON api_app_segment_version (segment_id)",
+    "CREATE INDEX ON api_app_campaign_fact_redshift (report_date)",
+    "CREATE INDEX ON api_app_currency_conversion (date)",
+]
+
+# Row counts at scale 1, everything else is derived from them
+SIZES = {
+    "orgs": 100,
+    "agencies": 10,
+    "segments": 500,
+    "versions": 20000,
+    "products": 5000,
+    "profiles": 200,
+    "integrations": 150,
+    "campaigns": 1000,
+    "rows_per_day": 50,
+}
+
+# Random helpers: an organization id, and midnight of a day of the exported range
+ORG = "'org' || (1 + floor(random() * %(orgs)s))::int"
+DAY = "%(start)s::timestamp + interval '1 day' * floor(random() * %(days)s)"
+
+DATA = [
+    """INSERT INTO auth_permission VALUES (1, 'feature_manage_org_segments'), (2, 'feature_manage_dashboards')""",
+    """INSERT INTO api_app_organization
+       SELECT 'org' || i, 'Organization ' || i, 'sf' || i,
+              CASE WHEN i > %(agencies)s AND random() < 0.5
+                  THEN 'org' || (1 + floor(random() * %(agencies)s))::int END,
+              (50 + floor(random() * 500))::int,
+              CASE WHEN random() < 0.9 THEN 'true' ELSE 'false' END,
+              CASE WHEN random() < 0.05 THEN 1 ELSE 0 END,
+              %(start)s::timestamp - interval '1 day' * floor(random() * 365) + interval '1 day' * (i %% 2) * %(days)s,
+              100, 10, 20, 50
+       FROM generate_series(1, %(orgs)s) i""",
+    """INSERT INTO api_app_organization_permissions
+       SELECT 'org' || i, CASE WHEN random() < 0.7 THEN 1 ELSE 2 END FROM generate_series(1, %(orgs)s) i""",
+    """INSERT INTO api_app_organizationgroup_permissions
+       SELECT 'org' || i, 1 FROM generate_series(1, %(orgs)s) i WHERE random() < 0.1""",
+    f"""INSERT INTO api_app_organization_members SELECT {ORG}, i FROM generate_series(1, %(orgs)s * 10) i""",
+    f"""INSERT INTO api_app_segment
+        SELECT i, {ORG}, CASE WHEN random() < 0.8 THEN 1 ELSE 0 END, CASE WHEN random() < 0.1 THEN 1 ELSE 0 END,
+               CASE WHEN random() < 0.5 THEN 'cobalt-' || i END
+        FROM generate_series(1, %(segments)s) i""",
+    """INSERT INTO api_app_segment_version
+       SELECT i, segment_id, product_id, created_at,
+              CASE WHEN random() < 0.5 THEN created_at + interval '1 hour' * floor(random() * 24 * 120) END,
+              CASE WHEN random() < 0.2 THEN created_at + interval '1 hour' * floor(random() * 24 * 60) END
+       FROM (SELECT i,
+                    (1 + floor(random() * %(segments)s))::int AS segment_id,
+                    'B0' || lpad((1 + floor(random() * %(products)s))::int::varchar, 8, '0') AS product_id,
+                    %(start)s::timestamp - interval '180 days' + interval '1 hour' * floor(random() * 24 * (%(days)s + 180))
+                        AS created_at
+             FROM generate_series(1, %(versions)s) i) versions""",
+    """INSERT INTO api_app_profile
+       SELECT i, (ARRAY['US', 'CA', 'GB', 'DE', 'JP'])[1 + floor(random() * 5)::int]
+       FROM generate_series(1, %(profiles)s) i""",
+    f"""INSERT INTO api_app_account_integration
+        SELECT i, {ORG}, CASE WHEN random() < 0.9 THEN 1 ELSE 0 END, {DAY}
+        FROM generate_series(1, %(integrations)s) i""",
+    f"""INSERT INTO api_app_account_integration_profiles
+        SELECT i, 1 + (i - 1) %% %(integrations)s, i,
+               CASE WHEN random() < 0.9 THEN 'active' ELSE 'inactive' END,
+               CASE WHEN random() < 0.9 THEN 'active' ELSE 'paused' END,
+               {DAY}
+        FROM generate_series(1, %(profiles)s) i""",
+    """INSERT INTO api_app_campaign
+       SELECT i, (1 + floor(random() * %(profiles)s))::int FROM generate_series(1, %(campaigns)s) i""",
+    """INSERT INTO api_app_dsp_advertiser
+       SELECT i, (1 + floor(random() * %(profiles)s))::int FROM generate_series(1, %(profiles)s / 2) i""",
+    """INSERT INTO api_app_calendar
+       SELECT day::date FROM generate_series(%(start)s::date - 366, %(end)s::date + 31, interval '1 day') day""",
+    """INSERT INTO api_app_currency_conversion
+       SELECT calendar.date, currency, 'USD', CASE WHEN currency = 'USD' THEN 1 ELSE 0.5 + random() END
+       FROM api_app_calendar calendar, unnest(ARRAY['USD', 'CAD', 'GBP', 'EUR', 'JPY']) currency""",
+    """INSERT INTO api_app_campaign_fact_redshift
+       SELECT day::date, campaign.id, round((random() * 500)::numeric, 4), round((random() * 50)::numeric, 4),
+              (ARRAY['USD', 'CAD', 'GBP', 'EUR', 'JPY'])[1 + floor(random() * 5)::int]
+       FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') day, api_app_campaign campaign
+       WHERE random() < 0.7""",
+    f"""INSERT INTO api_app_automation_task
+        SELECT {ORG}, CASE WHEN random() < 0.8 THEN 1 ELSE 0 END,
+               (ARRAY['time_parting', 'roi_optimization', 'advanced_budget_control', 'asin_harvesting',
+                      'budget_pacing', 'keyword_harvesting'])[1 + floor(random() * 6)::int],
+               {DAY}
+        FROM generate_series(1, %(days)s * %(rows_per_day)s) i""",
+    """INSERT INTO api_app_seller_central_account
+       SELECT i, CASE WHEN random() < 0.7 THEN 'seller_central' ELSE 'vendor_central' END,
+              CASE WHEN random() < 0.8 THEN (ARRAY['US', 'CA', 'GB', 'DE'])[1 + floor(random() * 4)::int] END,
+              (ARRAY['na', 'eu', 'fe'])[1 + floor(random() * 3)::int]
+       FROM generate_series(1, %(integrations)s) i""",
+    f"""INSERT INTO api_app_seller_central_account_integration
+        SELECT {ORG}, (1 + floor(random() * %(integrations)s))::int, {DAY}
+        FROM generate_series(1, %(days)s * %(rows_per_day)s / 5) i""",
+    """INSERT INTO api_app_sov_keyword SELECT i, random() < 0.2 FROM generate_series(1, %(products)s) i""",
+    f"""INSERT INTO api_app_sov_keyword_subscription
+        SELECT {ORG}, (1 + floor(random() * %(products)s))::int,
+               CASE WHEN random() < 0.8 THEN 'enabled' ELSE 'disabled' END, {DAY}
+        FROM generate_series(1, %(days)s * %(rows_per_day)s) i""",
+    f"""INSERT INTO api_app_rulebook SELECT {ORG}, {DAY} FROM generate_series(1, %(days)s * %(rows_per_day)s / 5) i""",
+    f"""INSERT INTO api_app_dashboard SELECT {ORG}, {DAY} FROM generate_series(1, %(days)s * %(rows_per_day)s / 5) i""",
+]
+
+
+def generate(conn, start, end, scale=1.0, seed=0.42):
+    """Recreate the report tables on ``conn`` and fill them for ``start`` to ``end`` at ``scale``."""
+    params = {name: max(1, int(size * scale)) for name, size in SIZES.items()}
+    params.update(start=start, end=end, days=(end - start).days + 1)
+    with conn.cursor() as cursor:
+        for table, columns in TABLES.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {table} ({columns})")
+        cursor.execute("SELECT setseed(%s)", (seed,))
+        for statement in DATA:
+            cursor.execute(statement, params)
+        for statement in INDEXES:
+            cursor.execute(statement)
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=datetime(2024, 1, 31))
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=float, default=0.42, help="random seed between -1 and 1")
+    args = parser.parse_args()
+
+    connections = ConnectionManager()
+    started = time.perf_counter()
+    with connections.connection() as conn:
+        generate(conn, args.start, args.end, args.scale, args.seed)
+    connections.close()
+    print(f"Generated scale {args.scale} data for {args.start:%Y-%m-%d} to {args.end:%Y-%m-%d} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
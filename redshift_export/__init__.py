@@ -0,0 +1,27 @@
+from . import reports  # noqa: F401  (registers the bundled reports)
+from .cadence import Period, periods
+from .engine import Exporter, run_report
+from .async_engine import AsyncExporter
+from .report import REPORTS, Report, SharedTable, SnapshotTable, bind_date, bind_range, get_report, register
+from .scheduler import Scheduler
+from .snapshot import Snapshot, SnapshotExporter, take_snapshot
+
+__all__ = [
+    "AsyncExporter",
+    "Exporter",
+    "Period",
+    "REPORTS",
+    "Report",
+    "Scheduler",
+    "SharedTable",
+    "Snapshot",
+    "SnapshotExporter",
+    "SnapshotTable",
+    "bind_date",
+    "bind_range",
+    "get_report",
+    "periods",
+    "register",
+    "run_report",
+    "take_snapshot",
+]
@@ -0,0 +1,294 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from .cadence import Period
+from .connection import backoff_delay
+from .engine import Exporter
+from .writers import Column
+
+
+def import_psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise RuntimeError("The async engine needs psycopg 3 (pip install 'psycopg[binary]')") from e
+    return psycopg
+
+
+def describe(description):
+    return [Column(*column) for column in description]
+
+
+class _Done:
+    def __init__(self, error=None):
+        self.error = error
+
+
+class BatchChannel:
+    """Hands row batches from the event loop to a writer thread, at most ``size`` batches ahead.
+
+    The loop side calls ``put`` and then ``finish``, passing the exception if
+    fetching failed; the writer thread iterates the channel, which raises
+    when fetching failed instead of ending the rows early.
+    """
+
+    def __init__(self, loop, size=2, observe=None):
+        self.loop = loop
+        self.observe = observe
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def put(self, rows):
+        await self._slots.acquire()
+        self._queue.put_nowait(rows)
+
+    def finish(self, error=None):
+        self._queue.put_nowait(_Done(error))
+
+    def __iter__(self):
+        while True:
+            if self.observe:
+                self.observe(self._queue.qsize())
+            item = asyncio.run_coroutine_threadsafe(self._queue.get(), self.loop).result()
+            if isinstance(item, _Done):
+                if item.error is not None:
+                    raise RuntimeError("Fetching the rows failed") from item.error
+                return
+            self.loop.call_soon_threadsafe(self._slots.release)
+            yield item
+
+
+class AsyncConnectionManager:
+    """asyncio counterpart of ``ConnectionManager`` on psycopg 3 connections, with the same settings."""
+
+    def __init__(self, params, max_connections=1, statement_timeout_ms=0, keepalives_idle=60, retries=3, backoff=5.0):
+        self.psycopg = import_psycopg()
+        self.params = {key: value for key, value in params.items() if value is not None}
+        self.statement_timeout_ms = statement_timeout_ms
+        self.keepalives_idle = keepalives_idle
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = asyncio.Semaphore(max(1, max_connections))
+        self._idle = []
+        # Session tables already created on each open connection as {name: query}, keyed by id(conn)
+        self._session_tables = {}
+
+    @classmethod
+    def like(cls, connections):
+        """An async manager with the settings of the synchronous ``connections``."""
+        return cls(
+            connections.params,
+            max_connections=connections.max_connections,
+            statement_timeout_ms=connections.statement_timeout_ms,
+            keepalives_idle=connections.keepalives_idle,
+            retries=connections.retries,
+            backoff=connections.backoff,
+        )
+
+    def is_transient(self, error):
+        psycopg = self.psycopg
+        return isinstance(error, (psycopg.OperationalError, psycopg.InterfaceError)) and not isinstance(
+            error, psycopg.errors.QueryCanceled
+        )
+
+    async def connect(self):
+        conn = await self.psycopg.AsyncConnection.connect(
+            **self.params,
+            keepalives=1,
+            keepalives_idle=self.keepalives_idle,
+            keepalives_interval=10,
+            keepalives_count=5,
+        )
+        if self.statement_timeout_ms:
+            await conn.execute(f"SET statement_timeout TO {int(self.statement_timeout_ms)}")
+            await conn.commit()
+        return conn
+
+    async def prepare(self, conn, session_tables):
+        """Create the ``session_tables`` missing from ``conn`` as temp tables and commit them."""
+        created = self._session_tables.setdefault(id(conn), {})
+        missing = [table for table in session_tables if created.get(table.name) != table.query]
+        if not missing:
+            return
+        for table in missing:
+            if table.name in created:
+                await conn.execute(f"DROP TABLE {table.name}")
+            await conn.execute(f"CREATE TEMP TABLE {table.name} AS {table.query}")
+        await conn.commit()
+        created.update((table.name, table.query) for table in missing)
+
+    async def _forget(self, conn):
+        self._session_tables.pop(id(conn), None)
+        await conn.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection, discarding it if the block raised a database error."""
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.closed:
+                if conn is not None:
+                    await self._forget(conn)
+                conn = await self.connect()
+            try:
+                yield conn
+            except self.psycopg.Error:
+                await self._forget(conn)
+                raise
+            except BaseException:
+                await self._release(conn)
+                raise
+            else:
+                await self._release(conn)
+
+    async def _release(self, conn):
+        try:
+            await conn.rollback()
+            self._idle.append(conn)
+        except self.psycopg.Error:
+            await self._forget(conn)
+
+    async def retry(self, work, description):
+        """Await ``work()``, retrying transient errors up to ``retries`` times with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await work()
+            except Exception as e:
+                if attempt == self.retries or not self.is_transient(e):
+                    raise
+                delay = backoff_delay(self.backoff, attempt)
+                print(f"{description} failed ({e.__class__.__name__}: {str(e).strip()}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        while self._idle:
+            await self._forget(self._idle.pop())
+
+
+class AsyncExporter(Exporter):
+    """``Exporter`` that runs its queries on asyncio with psycopg 3.
+
+    Up to ``workers`` windows are queried at once over their own
+    connections, all from one event loop. Each window's rows are fetched on
+    the loop while a writer thread serializes the batches already fetched,
+    so fetching and writing overlap, with up to ``pipeline_depth`` (2 by
+    default) batches queued between them. Files, manifests, the result cache and
+    timings are produced by the same code as the synchronous path, so the
+    output is identical. Only the cursor backend is supported.
+    """
+
+    def __init__(self, report, **options):
+        if options.get("backend", "cursor") != "cursor":
+            raise ValueError("The async engine only supports the cursor backend")
+        if options.get("delta") or options.get("shared") or options.get("client_rollup"):
+            raise ValueError("The async engine does not support delta exports, shared tables or client rollups")
+        import_psycopg()
+        super().__init__(report, **options)
+
+    def export_windows(self, windows):
+        return asyncio.run(self.export_windows_async(windows))
+
+    async def export_windows_async(self, windows):
+        self.async_connections = AsyncConnectionManager.like(self.connections)
+        slots = asyncio.Semaphore(self.workers)
+
+        async def export(window):
+            async with slots:
+                return await self.export_window_async(window)
+
+        try:
+            results = await asyncio.gather(*(export(window) for window in windows), return_exceptions=True)
+        finally:
+            await self.async_connections.close()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [filename for written in results for filename in written]
+
+    def run_attached(self, timings, work, *args):
+        """Run ``work`` (on a worker thread) with ``timings`` as the thread's current window."""
+        with self.metrics.attach(timings):
+            return work(*args)
+
+    async def export_window_async(self, window):
+        span = Period(window[0].start, window[-1].end)
+        if len(window) == 1:
+            print(f"Exporting {self.report.name} for {span.label}")
+        else:
+            print(f"Exporting {self.report.name} for {window[0].label} to {span.label}")
+        written = []
+
+        async def attempt():
+            written.clear()
+            if self.cacheable(window) and await asyncio.to_thread(
+                self.run_attached, timings, self.export_cached, window, written
+            ):
+                return
+            started = time.perf_counter()
+            async with self.async_connections.connection() as conn:
+                timings.record("connect", time.perf_counter() - started)
+                await self.export_window_on_async(conn, window, written, timings)
+
+        try:
+            with self.metrics.track(window, "query") as timings:
+                await self.async_connections.retry(attempt, f"Exporting {self.report.name} for {span.label}")
+        except Exception:
+            for period in window[len(written):]:
+                self.manifest.record(period.label, status="failed", query_hash=self.output_hash)
+            raise
+        return written
+
+    async def export_window_on_async(self, conn, window, written, timings):
+        psycopg = self.async_connections.psycopg
+        started = time.perf_counter()
+        await self.async_connections.prepare(conn, self.session_tables)
+        timings.record("prepare", time.perf_counter() - started)
+
+        span = Period(window[0].start, window[-1].end)
+        params = self.report.params(span)
+        # Bind client-side like psycopg2 does, so the cluster runs exactly the same SQL as the synchronous path
+        query = psycopg.AsyncClientCursor(conn).mogrify(self.query, params)
+        async with conn.cursor(name=f"export_{span.start:%Y%m%d}") as cursor:
+            started = time.perf_counter()
+            await cursor.execute(query)
+            timings.record("execute", time.perf_counter() - started)
+            started = time.perf_counter()
+            first = await cursor.fetchmany(self.fetch_size)
+            timings.record("first_row", time.perf_counter() - started)
+            description = describe(cursor.description)
+
+            channel = BatchChannel(asyncio.get_running_loop(), self.pipeline_depth or 2, self.observe_queue_depth)
+            batches = iter(channel)
+            if self.cacheable(window):
+                batches = self.cache.store(self.query_hash, params, description, batches)
+            writer = asyncio.ensure_future(
+                asyncio.to_thread(self.run_attached, timings, self.write_window, window, description, batches, written)
+            )
+            fetcher = asyncio.ensure_future(self.fetch_into(cursor, first, channel, timings))
+            await asyncio.wait({writer, fetcher}, return_when=asyncio.FIRST_EXCEPTION)
+            if writer.done() and not writer.cancelled() and writer.exception() is not None:
+                fetcher.cancel()
+                await asyncio.gather(fetcher, return_exceptions=True)
+                raise writer.exception()
+            try:
+                await fetcher
+            except BaseException:
+                # The writer fails too once it reaches the end of the channel
+                await asyncio.gather(writer, return_exceptions=True)
+                raise
+            await writer
+
+    async def fetch_into(self, cursor, first, channel, timings):
+        """Fetch the cursor's batches into ``channel``, starting with the already fetched ``first``."""
+        try:
+            rows = first
+            while rows:
+                await channel.put(rows)
+                started = time.perf_counter()
+                rows = await cursor.fetchmany(self.fetch_size)
+                timings.record("fetch", time.perf_counter() - started)
+        except BaseException as e:
+            channel.finish(e)
+            raise
+        channel.finish()
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+from . import config
+
+
+class ResultCache:
+    """On-disk cache of query results keyed by query hash and bound parameters.
+
+    Each entry is a gzip-compressed stream of pickles: the cursor
+    description followed by the row batches, so entries are written and
+    read back without holding the whole result in memory. Entries older
+    than ``ttl_days`` (0 keeps them forever) are treated as missing, and
+    once the cache outgrows ``max_bytes`` the least recently read entries
+    are evicted. Only a trusted local directory should be used, since
+    entries are unpickled.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30, ttl_days=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_days = ttl_days
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """The cache configured by ``EXPORT_CACHE_DIR``, or None when it is unset."""
+        if not os.getenv("EXPORT_CACHE_DIR"):
+            return None
+        return cls(
+            os.getenv("EXPORT_CACHE_DIR"),
+            max_bytes=config.env_int("EXPORT_CACHE_MAX_MB", 1024) << 20,
+            ttl_days=config.env_int("EXPORT_CACHE_TTL_DAYS", 0),
+        )
+
+    def path(self, query_hash, params):
+        bound = json.dumps(params, default=str, sort_keys=True)
+        key = hashlib.sha256(f"{query_hash}\n{bound}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.pickle.gz")
+
+    def get(self, query_hash, params):
+        """Return ``(description, batches)`` for a cached result, or None on a miss."""
+        path = self.path(query_hash, params)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if self.ttl_days and stat.st_mtime < time.time() - self.ttl_days * 86400:
+            self.discard(query_hash, params)
+            return None
+        # Reading refreshes the access time that eviction goes by, the modification time keeps the entry's age
+        os.utime(path, (time.time(), stat.st_mtime))
+        f = gzip.open(path, "rb")
+        try:
+            description = pickle.load(f)
+        except BaseException:
+            f.close()
+            raise
+        return description, self._read_batches(f)
+
+    @staticmethod
+    def _read_batches(f):
+        with f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def store(self, query_hash, params, description, batches):
+        """Pass ``batches`` through while writing them to the cache.
+
+        The entry only becomes visible once every batch has been consumed, so
+        an interrupted export never leaves a partial result behind.
+        """
+        path = self.path(query_hash, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                pickle.dump(description, f, protocol=pickle.HIGHEST_PROTOCOL)
+                for rows in batches:
+                    pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield rows
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def discard(self, query_hash, params):
+        try:
+            os.remove(self.path(query_hash, params))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove the least recently read entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".pickle.gz"):
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_atime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
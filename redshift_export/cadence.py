@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass(frozen=True)
+class Period:
+    """A span of days exported into a single output file (both ends inclusive)."""
+
+    start: datetime
+    end: datetime
+
+    @property
+    def label(self):
+        return self.end.strftime("%Y-%m-%d")
+
+
+def last_day_of_month(date):
+    next_month = date.replace(day=28) + timedelta(days=4)
+    return next_month - timedelta(days=next_month.day)
+
+
+def daily(start_date, end_date):
+    while start_date <= end_date:
+        yield Period(start_date, start_date)
+        start_date += timedelta(days=1)
+
+
+def monthly(start_date, end_date):
+    while start_date <= end_date:
+        month_end = last_day_of_month(start_date)
+        yield Period(start_date, month_end)
+        start_date = month_end + timedelta(days=1)
+
+
+CADENCES = {
+    "daily": daily,
+    "monthly": monthly,
+}
+
+
+def periods(cadence, start_date, end_date):
+    if cadence not in CADENCES:
+        raise ValueError(f"Unknown cadence {cadence!r}, expected one of {sorted(CADENCES)}")
+    return list(CADENCES[cadence](start_date, end_date))
+
+
+def previous_period(cadence, period):
+    """The period of ``cadence`` that ends the day before ``period`` starts."""
+    end = period.start - timedelta(days=1)
+    return periods(cadence, end.replace(day=1), end)[-1]
@@ -0,0 +1,127 @@
+"""Command line entry point for exporting the registered reports.
+
+    python -m redshift_export list
+    python -m redshift_export run asin_usage_monthly --from 2023-01-01 --to 2023-12-31
+    python -m redshift_export run daily_org_resource_report asin_usage_daily --workers 4 --format parquet
+    python -m redshift_export run all
+    python -m redshift_export run daily_org_resource_report asin_usage_daily --shared --workers 4
+
+Every report named in one ``run`` is exported by the same process over one
+connection pool and result cache. Options left out fall back to the
+``EXPORT_*`` environment settings, and dates to each report's default
+range. With ``--shared`` the reports are exported together by a
+``Scheduler``, computing the per-date results they share once.
+
+``--cadence`` exports reports bound to a date range by other periods,
+into a subdirectory of the report's named after the cadence so its files
+and manifest stay apart from the report's own. Reports whose rows
+aggregate whole periods of their own cadence are refused.
+"""
+
+import argparse
+import dataclasses
+import os
+import traceback
+from datetime import datetime
+
+from . import config
+from .cache import ResultCache
+from .cadence import CADENCES
+from .connection import ConnectionManager
+from .engine import exporter_class
+from .report import REPORTS, bind_range, get_report
+from .scheduler import Scheduler
+from .writers import WRITERS
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def list_reports(args):
+    for name, report in sorted(REPORTS.items()):
+        until = f"{report.end_date:%Y-%m-%d}" if report.end_date else "today"
+        print(f"{name:<32} {report.cadence:<8} {report.start_date:%Y-%m-%d} to {until}")
+    return 0
+
+
+def with_cadence(report, cadence):
+    """``report`` exported by ``cadence`` periods into ``<output_dir>/<cadence>``, or unchanged without one."""
+    if cadence is None or cadence == report.cadence:
+        return report
+    if report.bind is not bind_range:
+        raise ValueError(f"report {report.name!r} binds one date per {report.cadence} period, it cannot run {cadence}")
+    if report.fixed_cadence:
+        raise ValueError(f"report {report.name!r} aggregates whole {report.cadence} periods, it cannot run {cadence}")
+    return dataclasses.replace(report, cadence=cadence, output_dir=os.path.join(report.output_dir, cadence))
+
+
+def run(args):
+    reports = args.reports
+    overrides = {"cache": ResultCache.from_env()}
+    if args.workers is not None:
+        overrides["workers"] = args.workers
+    if args.format is not None:
+        overrides["output_format"] = args.format
+    workers = overrides.get("workers") or config.env_int("EXPORT_WORKERS", 1)
+    connections = ConnectionManager.from_env(max_connections=workers)
+    if args.shared:
+        return run_shared(args, reports, connections, overrides)
+    failed = []
+    try:
+        for report in reports:
+            try:
+                exporter = exporter_class(args.engine).from_env(report, connections=connections, **overrides)
+                exporter.run(args.start, args.end)
+            except Exception:
+                traceback.print_exc()
+                failed.append(report.name)
+    finally:
+        connections.close()
+    if failed:
+        print(f"Failed to export {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def run_shared(args, reports, connections, overrides):
+    try:
+        Scheduler.from_env(reports, connections, **overrides).run(args.start, args.end)
+    except Exception as e:
+        print(e)
+        return 1
+    finally:
+        connections.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="redshift-export", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list the registered reports").set_defaults(command=list_reports)
+
+    run_parser = commands.add_parser("run", help="export reports over a date range")
+    run_parser.add_argument("reports", nargs="+", metavar="report", help="registered report name, or 'all'")
+    run_parser.add_argument("--from", dest="start", type=parse_date, help="first day (default: the report's start)")
+    run_parser.add_argument("--to", dest="end", type=parse_date, help="last day (default: the report's end or today)")
+    run_parser.add_argument("--cadence", choices=sorted(CADENCES), help="period length of range-bound reports")
+    run_parser.add_argument("--workers", type=int, help="periods exported in parallel (default: EXPORT_WORKERS)")
+    run_parser.add_argument("--format", choices=sorted(WRITERS), help="output format (default: EXPORT_FORMAT)")
+    run_parser.add_argument("--engine", choices=("sync", "async", "snapshot"), help="default: EXPORT_ENGINE")
+    run_parser.add_argument("--shared", action="store_true", help="export the reports together, sharing results")
+    run_parser.set_defaults(command=run)
+
+    args = parser.parse_args(argv)
+    if args.command is run:
+        if args.shared and args.engine not in (None, "sync"):
+            parser.error("--shared runs on the sync engine")
+        unknown = [name for name in args.reports if name not in REPORTS and args.reports != ["all"]]
+        if unknown:
+            parser.error(f"unknown report {unknown[0]!r}, expected one of {sorted(REPORTS)} or 'all'")
+        names = sorted(REPORTS) if args.reports == ["all"] else args.reports
+        try:
+            args.reports = [with_cadence(get_report(name), args.cadence) for name in names]
+        except ValueError as e:
+            parser.error(str(e))
+    return args.command(args)
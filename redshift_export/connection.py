@@ -0,0 +1,216 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from . import config
+
+# Errors that mean the connection or the cluster hiccupped, so the work is worth retrying.
+# Statement timeouts are excluded: the same query would most likely time out again.
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_ERRORS) and not isinstance(error, psycopg2.extensions.QueryCanceledError)
+
+
+def backoff_delay(backoff, attempt):
+    """Exponential backoff with jitter for the ``attempt``-th retry."""
+    return backoff * 2**attempt * random.uniform(0.8, 1.2)
+
+
+class ConnectionManager:
+    """Bounded pool of Redshift connections built from ``db_params``.
+
+    Connections are opened lazily with TCP keepalives and an optional
+    statement timeout, at most ``max_connections`` are checked out at once,
+    and connections that failed are discarded instead of being reused.
+    ``retry`` re-runs work that hit a transient error with exponential
+    backoff. ``prepare`` materializes session temp tables at most once per
+    connection, and ``prepare_shared`` the rows of shared tables at most
+    once per connection and parameters. Checking out a connection prefers
+    an idle one that already holds the shared rows the work reads.
+    """
+
+    def __init__(
+        self,
+        params=None,
+        max_connections=1,
+        statement_timeout_ms=0,
+        keepalives_idle=60,
+        retries=3,
+        backoff=5.0,
+    ):
+        self.params = params or config.db_params()
+        self.max_connections = max(1, max_connections)
+        self.statement_timeout_ms = statement_timeout_ms
+        self.keepalives_idle = keepalives_idle
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+        # Session tables already created on each open connection as {name: query}, keyed by id(conn)
+        self._session_tables = {}
+        # Shared tables created on each open connection as {name: query}, and the keys of the rows in them
+        self._shared_tables = {}
+        self._shared_rows = {}
+
+    @classmethod
+    def from_env(cls, **overrides):
+        options = {
+            "statement_timeout_ms": config.env_int("DB_STATEMENT_TIMEOUT_MS", 0),
+            "keepalives_idle": config.env_int("DB_KEEPALIVES_IDLE", 60),
+            "retries": config.env_int("EXPORT_RETRIES", 3),
+            "backoff": config.env_float("EXPORT_RETRY_BACKOFF", 5.0),
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def connect(self):
+        conn = psycopg2.connect(
+            **self.params,
+            keepalives=1,
+            keepalives_idle=self.keepalives_idle,
+            keepalives_interval=10,
+            keepalives_count=5,
+        )
+        if self.statement_timeout_ms:
+            with conn.cursor() as cursor:
+                cursor.execute("SET statement_timeout TO %s", (self.statement_timeout_ms,))
+            conn.commit()
+        return conn
+
+    def acquire(self, shared_keys=()):
+        self._slots.acquire()
+        try:
+            with self._lock:
+                conn = self._idle.pop(self._pick_idle(shared_keys)) if self._idle else None
+            if conn is None or conn.closed:
+                if conn is not None:
+                    self._forget(conn)
+                conn = self.connect()
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _pick_idle(self, shared_keys):
+        """Index of the idle connection holding the most of ``shared_keys``, the least recently used one on a tie.
+
+        Work reading shared rows usually follows other work reading the same
+        rows, so leaving the most recently used connections to it keeps those
+        rows from being computed again on another connection.
+        """
+        if not shared_keys:
+            return -1
+        wanted = set(shared_keys)
+        return max(range(len(self._idle)), key=lambda i: len(self._shared_rows.get(id(self._idle[i]), set()) & wanted))
+
+    def prepare(self, conn, session_tables):
+        """Create the ``session_tables`` missing from ``conn`` as temp tables and commit them.
+
+        A table already created under the same name from a different query is
+        dropped and recreated.
+        """
+        created = self._session_tables.setdefault(id(conn), {})
+        missing = [table for table in session_tables if created.get(table.name) != table.query]
+        if not missing:
+            return
+        with conn.cursor() as cursor:
+            for table in missing:
+                if table.name in created:
+                    cursor.execute(f"DROP TABLE {table.name}")
+                cursor.execute(f"CREATE TEMP TABLE {table.name} AS {table.query}")
+        conn.commit()
+        created.update((table.name, table.query) for table in missing)
+
+    def prepare_shared(self, conn, shared_tables, params):
+        """Insert the rows of ``shared_tables`` for ``params`` missing from ``conn`` and commit them.
+
+        Returns ``params`` with every shared table's parameters added, which
+        the query reading the tables binds. A table created from a different
+        query is dropped and recreated.
+        """
+        created = self._shared_tables.setdefault(id(conn), {})
+        held = self._shared_rows.setdefault(id(conn), set())
+        query_params = dict(params)
+        tables, keys = {}, set()
+        with conn.cursor() as cursor:
+            for table in shared_tables:
+                table_params = table.bind(params)
+                query_params.update(table_params)
+                key = table.key(params)
+                current = created.get(table.name) == table.query
+                if current and key in held:
+                    continue
+                if table.name in created and not current:
+                    cursor.execute(f"DROP TABLE {table.name}")
+                    held.difference_update({row_key for row_key in held if row_key[0] == table.name})
+                if current or table.name in tables:
+                    cursor.execute(f"INSERT INTO {table.name} {table.query}", table_params)
+                else:
+                    cursor.execute(f"CREATE TEMP TABLE {table.name} AS {table.query}", table_params)
+                tables[table.name] = table.query
+                keys.add(key)
+        if keys:
+            conn.commit()
+            created.update(tables)
+            held.update(keys)
+        return query_params
+
+    def _forget(self, conn):
+        self._session_tables.pop(id(conn), None)
+        self._shared_tables.pop(id(conn), None)
+        self._shared_rows.pop(id(conn), None)
+        conn.close()
+
+    def release(self, conn, discard=False):
+        try:
+            if discard or conn.closed:
+                self._forget(conn)
+            else:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append(conn)
+        except psycopg2.Error:
+            self._forget(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, shared_keys=()):
+        """Check out a connection, discarding it if the block raised a database error."""
+        conn = self.acquire(shared_keys)
+        try:
+            yield conn
+        except psycopg2.Error:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def retry(self, work, description):
+        """Call ``work()``, retrying transient errors up to ``retries`` times with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            try:
+                return work()
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                delay = backoff_delay(self.backoff, attempt)
+                print(f"{description} failed ({e.__class__.__name__}: {str(e).strip()}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                self._forget(conn)
+            self._idle.clear()
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from .writers import import_pyarrow, arrow_schema, record_batch
+
+# Column added to every row with the period the row was exported for
+EXPORT_DATE_COLUMN = "export_date"
+
+
+class PartitionedDataset:
+    """Hive-style Parquet dataset at ``<root>/report=<name>/year=YYYY/month=MM/data.parquet``.
+
+    Every period is stored as its own row groups tagged with an
+    ``export_date`` column, so readers can open the whole dataset once and
+    prune partitions and row groups by date. Exporting a period again
+    replaces its row groups; each partition is rewritten to a temporary file
+    and moved into place by ``commit``, so readers only ever see complete
+    partitions.
+    """
+
+    def __init__(self, root, report_name):
+        self.root = os.path.join(root, f"report={report_name}")
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def partition_path(self, period):
+        return os.path.join(self.root, f"year={period.end:%Y}", f"month={period.end:%m}", "data.parquet")
+
+    def _lock(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def write(self, period, description, batches, commit=os.replace):
+        """Replace ``period``'s rows in its partition and return the rows and bytes written for it.
+
+        ``commit(tmp, path)`` moves the rewritten partition into place, with
+        ``os.replace`` by default; the exporter's also syncs it to disk.
+        """
+        pa = import_pyarrow()
+        import pyarrow.parquet as pq
+
+        columns = arrow_schema(pa, description)
+        schema = columns.append(pa.field(EXPORT_DATE_COLUMN, pa.date32()))
+        export_date = period.end.date()
+        path = self.partition_path(period)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Stage the new rows on disk first so memory stays bounded by one batch
+        staging = f"{path}.{period.label}.staging"
+        rows = 0
+        with pq.ParquetWriter(staging, schema) as writer:
+            for batch in batches:
+                data = record_batch(pa, columns, batch)
+                dates = pa.array([export_date] * len(batch), pa.date32())
+                writer.write_batch(pa.RecordBatch.from_arrays(data.columns + [dates], schema=schema))
+                rows += len(batch)
+
+        with self._lock(path):
+            staged = pq.ParquetFile(staging)
+            sources = [staged]
+            groups = [(export_date, staged, index) for index in range(staged.num_row_groups)]
+            if os.path.exists(path):
+                existing = pq.ParquetFile(path)
+                sources.append(existing)
+                date_index = existing.schema_arrow.get_field_index(EXPORT_DATE_COLUMN)
+                for index in range(existing.num_row_groups):
+                    group_date = existing.metadata.row_group(index).column(date_index).statistics.min
+                    if group_date != export_date:
+                        groups.append((group_date, existing, index))
+            groups.sort(key=lambda group: group[0])
+
+            tmp = path + ".tmp"
+            with pq.ParquetWriter(tmp, schema) as writer:
+                for _, source, index in groups:
+                    writer.write_table(source.read_row_group(index).cast(schema))
+            for source in sources:
+                source.close()
+            size = os.path.getsize(staging)
+            commit(tmp, path)
+            os.remove(staging)
+        return rows, size
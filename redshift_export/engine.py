@@ -0,0 +1,794 @@
+import io
+import os
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+
+import psycopg2
+import psycopg2.errors
+
+from . import config
+from .cache import ResultCache
+from .cadence import Period, periods, previous_period
+from .connection import ConnectionManager
+from .dataset import PartitionedDataset
+from .manifest import Manifest, export_hash, file_checksum, query_hash
+from .metrics import RunMetrics
+from .plans import PlanHistory, explain
+from .report import get_report
+from .staging import stage_invariant_ctes
+from .unload import Unloader, csv_header
+from .writers import CSV_FORMATS, get_writer, open_csv_bytes
+
+# Errors a server without ``COPY ... TO STDOUT`` raises for it: unsupported feature, rejected syntax or Redshift's
+# generic internal error. Only checked against a trivial query, so they cannot come from a report's own query.
+COPY_ERRORS = (psycopg2.NotSupportedError, psycopg2.errors.SyntaxError, psycopg2.InternalError)
+
+
+def fetch_batches(cursor, fetch_size, first=None):
+    """Yield row batches from ``cursor`` until it is exhausted."""
+    rows = first if first is not None else cursor.fetchmany(fetch_size)
+    while rows:
+        yield rows
+        rows = cursor.fetchmany(fetch_size)
+
+
+def rebatch(rows, size):
+    """Group a flat row iterator back into lists of at most ``size`` rows."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def split_by_period(batches, index, window, batch_size):
+    """Split rows ordered by the date in column ``index`` into one batch iterator per period.
+
+    Yields ``(period, batches)`` for every period of ``window`` in order,
+    including periods without rows. Each iterator must be consumed before
+    advancing to the next period. A row outside the window or out of order
+    raises before any later period is yielded, so no empty file is written
+    in place of its rows.
+    """
+    by_day = {}
+    for position, period in enumerate(window):
+        day = period.start.date()
+        while day <= period.end.date():
+            by_day[day] = position
+            day += timedelta(days=1)
+
+    rows = (row for rows in batches for row in rows)
+    done = 0
+    for position, group in groupby(rows, key=lambda row: by_day.get(as_date(row[index]))):
+        if position is None or position < done:
+            raise ValueError("Rows must be ordered by their split column and fall inside the exported window")
+        for skipped in window[done:position]:
+            yield skipped, iter(())
+        done = position + 1
+        yield window[position], rebatch(group, batch_size)
+    for skipped in window[done:]:
+        yield skipped, iter(())
+
+
+def carry_forward(description, batches, previous, key, columns):
+    """Fill in ``columns`` of the rows a delta query did not recompute from the previous period's rows.
+
+    ``description`` and ``batches`` come from the delta query, whose last
+    column flags recomputed rows; ``previous`` is the previous period's
+    ``(description, rows)``. Returns the description and batches without
+    the flag column.
+    """
+    names = [column[0] for column in description[:-1]]
+    previous_description, previous_rows = previous
+    previous_names = [column[0] for column in previous_description]
+    previous_key = previous_names.index(key)
+    previous_by_key = {row[previous_key]: row for row in previous_rows}
+    key_index = names.index(key)
+    carried = [(names.index(name), previous_names.index(name)) for name in columns]
+
+    def merged():
+        for rows in batches:
+            out = []
+            for row in rows:
+                *values, recomputed = row
+                if not recomputed:
+                    if row[key_index] not in previous_by_key:
+                        raise ValueError(f"{key} {row[key_index]!r} was not recomputed and has no previous row")
+                    previous_row = previous_by_key[row[key_index]]
+                    for index, previous_index in carried:
+                        values[index] = previous_row[previous_index]
+                out.append(tuple(values))
+            yield out
+
+    return description[:-1], merged()
+
+
+def fsync(filename):
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_synced(tmp, filename):
+    """Rename ``tmp`` over ``filename`` with the data and the rename both on disk before returning."""
+    fsync(tmp)
+    os.replace(tmp, filename)
+    fsync(os.path.dirname(filename))
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class Prefetcher:
+    """Iterates ``batches`` on a background thread, up to ``depth`` batches ahead of the consumer.
+
+    Used as a context manager around the consumer, so the fetching thread has
+    stopped before the cursor behind ``batches`` is closed. Errors raised
+    while fetching are re-raised in the consumer. ``observe`` is called with
+    the queue depth each time the consumer takes a batch.
+    """
+
+    _DONE = object()
+
+    def __init__(self, batches, depth, observe=None):
+        self.batches = batches
+        self.queue = queue.Queue(depth)
+        self.observe = observe
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fetch, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return iter(self)
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fetch(self):
+        try:
+            for rows in self.batches:
+                if not self._put(rows):
+                    return
+        except BaseException as e:
+            self._put(_Failed(e))
+            return
+        self._put(self._DONE)
+
+    def __iter__(self):
+        while True:
+            if self.observe:
+                self.observe(self.queue.qsize())
+            item = self.queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+
+class RowCounter:
+    """Pass row batches through while counting the rows."""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.rows = 0
+
+    def __iter__(self):
+        for rows in self.batches:
+            self.rows += len(rows)
+            yield rows
+
+
+class Exporter:
+    """Runs a report over a date range, one output file per period.
+
+    Rows are streamed through a server-side cursor in batches of
+    ``fetch_size`` and periods are fanned out across ``workers`` threads,
+    each using its own connection from ``connections``. Work that hits a
+    transient connection error is retried on a fresh connection.
+
+    Reports with a ``split_column`` can be exported ``batch_periods``
+    consecutive periods per query; the rows are split client-side into the
+    usual per-period files.
+
+    With ``backend="unload"`` each period is exported by the cluster with
+    ``UNLOAD ... PARALLEL ON`` and the parts are merged into the same file.
+    Values are spelled as in the cluster's text output, so the manifest
+    records these files apart from the cursor's and switching backends
+    re-exports them. ``UNLOAD_LOCAL_COPY`` runs the backend on Postgres
+    through a ``COPY`` stand-in.
+
+    With ``backend="copy"`` (CSV formats only) the server renders each
+    period as CSV with ``COPY (...) TO STDOUT``, streamed straight into the
+    file without building Python rows. The server's CSV spells some values
+    differently, e.g. booleans as ``t``/``f`` and line ends as ``\n``, so
+    the manifest records these files apart too. Support is checked once
+    when the run is planned: clusters without ``COPY TO STDOUT``, such as
+    Redshift, export and record every period through the cursor path, and
+    otherwise a period whose ``COPY`` fails is recorded failed.
+
+    With ``layout="partitioned"`` periods are merged into a Hive-style
+    Parquet dataset with one file per month instead of one file each.
+
+    With ``precompute`` set, reports that provide a ``precomputed_query``
+    run it instead, and CTEs that do not depend on the period are moved out
+    of the query; both are materialized as session tables once per
+    connection and reused by every period exported over it.
+
+    With ``shared`` set, reports that provide a ``shared_query`` run it on
+    the cursor backend instead, reading per-date results from their
+    ``shared_tables``. Those rows are materialized once per connection and
+    parameters, so periods and reports reading the same rows compute them
+    once; the ``Scheduler`` runs reports together this way.
+
+    With ``incremental`` set, periods recorded as complete in the report's
+    manifest with an unchanged query are skipped, except those ending within
+    the last ``refresh_days`` days, whose source data may still be changing.
+
+    With a ``cache``, query results for periods older than ``refresh_days``
+    are kept in a ``ResultCache`` and later runs over the same periods are
+    written from it without querying the database.
+
+    Every window's connect, prepare, execute, first row, fetch, serialize and
+    fsync times are appended as JSON lines to ``timings_path`` (next to the
+    manifest by default), followed by a summary at the end of the run.
+
+    With ``pipeline_depth`` above 0, a background thread fetches up to that
+    many batches ahead while the current one is being written, so waiting on
+    the cluster overlaps with serializing. The fetch phase then measures how
+    long writing stalled waiting for rows, and the queue depth is recorded
+    as a gauge.
+
+    With ``delta`` set, reports with a ``delta_query`` export each period
+    from the previous period's result, kept in a ``ResultCache`` next to
+    the manifest: only the rows whose inputs changed are recomputed and the
+    rest carry their values forward. Periods are exported in order on one
+    worker, and a period whose predecessor has no saved result runs the
+    full query. Only the results later periods start from are kept: the
+    last exported period's and those before periods recent enough to be
+    exported again. A delta query only sees the changes its report can
+    date, so every ``delta_full_days`` days from the report's start (0
+    never) a period runs the full query, bounding how long carried values
+    can drift from it.
+
+    With ``client_rollup`` set, reports with a ``rollup`` fetch each
+    window's unaggregated rows once and aggregate them in-process instead of
+    on the cluster, which pairs well with a large ``batch_periods``.
+
+    With ``explain`` set, the plan of the first window to export is captured
+    with ``EXPLAIN`` before the run and recorded in the report's
+    ``PlanHistory``, which warns about plan changes, cost jumps and
+    nested-loop or broadcast steps.
+    """
+
+    def __init__(
+        self,
+        report,
+        workers=1,
+        streaming=True,
+        fetch_size=10000,
+        output_format="csv",
+        exports_dir=config.EXPORTS_DIR,
+        incremental=False,
+        refresh_days=1,
+        batch_periods=1,
+        backend="cursor",
+        unloader=None,
+        compression_level=None,
+        layout="files",
+        connections=None,
+        precompute=False,
+        cache=None,
+        timings_path=None,
+        explain=False,
+        pipeline_depth=0,
+        delta=False,
+        delta_full_days=7,
+        client_rollup=False,
+        shared=False,
+    ):
+        if layout not in ("files", "partitioned"):
+            raise ValueError(f"Unknown layout {layout!r}, expected 'files' or 'partitioned'")
+        if layout == "partitioned" and output_format != "parquet":
+            raise ValueError("The partitioned layout is written as Parquet, set the output format to 'parquet'")
+        if backend not in ("cursor", "unload", "copy"):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'cursor', 'unload' or 'copy'")
+        if delta and report.delta_query is None:
+            raise ValueError(f"Report {report.name!r} has no delta query")
+        if delta and backend != "cursor":
+            raise ValueError("Delta exports run on the cursor backend")
+        if client_rollup and (report.rollup is None or backend != "cursor" or delta):
+            raise ValueError(f"Report {report.name!r} has no rollup to run on the cursor backend without delta")
+        if backend == "copy" and (output_format not in CSV_FORMATS or layout != "files"):
+            raise ValueError(f"The copy backend writes CSV files, set the output format to one of {CSV_FORMATS}")
+        self.report = report
+        # Each delta period builds on the previous one's result, so they run one after another
+        self.workers = 1 if delta else max(1, workers)
+        self.streaming = streaming
+        self.fetch_size = fetch_size
+        self.output_format = output_format
+        self.extension, self.write = get_writer(output_format, compression_level)
+        self.compression_level = compression_level
+        self.dataset = None
+        if layout == "partitioned":
+            self.dataset = PartitionedDataset(os.path.join(exports_dir, "dataset"), report.name)
+        self.exports_dir = exports_dir
+        self.incremental = incremental
+        self.refresh_days = refresh_days
+        self.batch_periods = max(1, batch_periods) if report.split_column and backend == "cursor" else 1
+        self.backend = backend
+        self.copy_supported = backend == "copy"
+        self.unloader = unloader or (Unloader.from_env() if backend == "unload" else None)
+        # The precomputed query returns the same rows, so both share the manifest's query hash
+        self.query_hash = query_hash(report.query)
+        self.query = report.query
+        self.session_tables = ()
+        self.shared_tables = ()
+        if shared and report.shared_query and backend == "cursor" and not (delta or client_rollup):
+            self.query = report.shared_query
+            self.shared_tables = report.shared_tables
+            self.session_tables = report.session_tables + tuple(
+                session_table for table in report.shared_tables for session_table in table.session_tables
+            )
+        elif precompute and report.precomputed_query:
+            self.query = report.precomputed_query
+            self.session_tables = report.session_tables
+        if precompute:
+            staged, self.query = stage_invariant_ctes(self.query)
+            self.session_tables += staged
+        self.session_tables = tuple({table.name: table for table in self.session_tables}.values())
+        self.client_rollup = client_rollup
+        self.delta_state = None
+        self.delta_full_days = delta_full_days
+        if delta:
+            staged, self.delta_query = (), report.delta_query
+            if precompute:
+                staged, self.delta_query = stage_invariant_ctes(report.delta_query)
+            tables = self.session_tables + report.session_tables + staged
+            self.session_tables = tuple({table.name: table for table in tables}.values())
+            self.delta_state = ResultCache(os.path.join(exports_dir, report.output_dir, ".delta"))
+        self.cache = cache
+        self.manifest = Manifest(os.path.join(exports_dir, report.output_dir, f"{report.name}.manifest.json"))
+        self.timings_path = timings_path or os.path.join(
+            exports_dir, report.output_dir, f"{report.name}.timings.jsonl"
+        )
+        self.metrics = RunMetrics(report.name, self.timings_path)
+        self.pipeline_depth = pipeline_depth
+        self.plans = None
+        if explain:
+            self.plans = PlanHistory(
+                os.path.join(exports_dir, report.output_dir),
+                report.name,
+                cost_ratio=config.env_float("EXPORT_EXPLAIN_COST_RATIO", 2.0),
+            )
+        self.owns_connections = connections is None
+        self.connections = connections or ConnectionManager(max_connections=self.workers)
+
+    @classmethod
+    def from_env(cls, report, **overrides):
+        options = {
+            "workers": config.env_int("EXPORT_WORKERS", 1),
+            "streaming": config.env_flag("EXPORT_STREAMING", True),
+            "fetch_size": config.env_int("EXPORT_FETCH_SIZE", 10000),
+            "output_format": os.getenv("EXPORT_FORMAT", "csv"),
+            "compression_level": config.env_int("EXPORT_COMPRESSION_LEVEL", None),
+            "layout": os.getenv("EXPORT_LAYOUT", "files"),
+            "incremental": config.env_flag("EXPORT_INCREMENTAL", False),
+            "refresh_days": config.env_int("EXPORT_REFRESH_DAYS", 1),
+            "batch_periods": config.env_int("EXPORT_BATCH_PERIODS", 1),
+            "backend": os.getenv("EXPORT_BACKEND", "cursor"),
+            "precompute": config.env_flag("EXPORT_PRECOMPUTE", False),
+            "timings_path": os.getenv("EXPORT_TIMINGS_PATH") or None,
+            "explain": config.env_flag("EXPORT_EXPLAIN", False),
+            "pipeline_depth": config.env_int("EXPORT_PIPELINE_DEPTH", 0),
+            "delta": config.env_flag("EXPORT_DELTA", False),
+            "delta_full_days": config.env_int("EXPORT_DELTA_FULL_DAYS", 7),
+            "client_rollup": config.env_flag("EXPORT_CLIENT_ROLLUP", False),
+            "shared": config.env_flag("EXPORT_SHARED", False),
+            "cache": ResultCache.from_env(),
+        }
+        options.update(overrides)
+        if "connections" in options:
+            return cls(report, **options)
+        connections = ConnectionManager.from_env(max_connections=options["workers"])
+        exporter = cls(report, connections=connections, **options)
+        exporter.owns_connections = True
+        return exporter
+
+    def close(self):
+        if self.owns_connections:
+            self.connections.close()
+
+    @property
+    def output_hash(self):
+        """Hash the manifest records this exporter's files under, which tells apart backends writing other bytes."""
+        if self.backend == "unload":
+            return export_hash(self.report.query, "unload")
+        return export_hash(self.report.query, "copy" if self.copy_supported else "cursor")
+
+    def output_path(self, period):
+        if self.dataset:
+            return self.dataset.partition_path(period)
+        filename = self.report.filename.format(date=period.label) + self.extension
+        return os.path.join(self.exports_dir, self.report.output_dir, filename)
+
+    def cursor(self, conn, period):
+        if self.streaming:
+            cursor = conn.cursor(name=f"export_{period.start:%Y%m%d}")
+            cursor.itersize = self.fetch_size
+            return cursor
+        return conn.cursor()
+
+    def is_recent(self, period):
+        """Whether ``period`` ends within the last ``refresh_days`` days, so its data may still change."""
+        return period.end >= datetime.now() - timedelta(days=self.refresh_days)
+
+    def needs_export(self, period):
+        if not self.incremental:
+            return True
+        if self.is_recent(period):
+            return True
+        return not self.manifest.is_current(period.label, self.output_hash, self.output_path(period))
+
+    def windows(self, todo):
+        """Group consecutive periods into windows of at most ``batch_periods`` periods."""
+        windows = []
+        for period in todo:
+            window = windows[-1] if windows else None
+            if (
+                window
+                and len(window) < self.batch_periods
+                and period.start.date() == window[-1].end.date() + timedelta(days=1)
+            ):
+                window.append(period)
+            else:
+                windows.append([period])
+        return windows
+
+    def commit_period(self, period, write):
+        """Produce a period's file with ``write(filename)``, which returns the row count, and record it."""
+        filename = self.output_path(period)
+
+        # Write to a temporary file so an interrupted export never looks complete
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp = filename + ".tmp"
+        with self.metrics.phase("serialize"):
+            rows = write(tmp)
+        self.commit_file(tmp, filename)
+        size = os.path.getsize(filename)
+        self.metrics.count(rows, size)
+        return self.record_complete(period, filename, rows, size)
+
+    def commit_file(self, tmp, filename):
+        """Move a finished ``tmp`` file into place, synced to disk before the manifest can record it."""
+        with self.metrics.phase("fsync"):
+            replace_synced(tmp, filename)
+
+    def record_complete(self, period, filename, rows, size):
+        self.manifest.record(
+            period.label,
+            status="complete",
+            query_hash=self.output_hash,
+            output=os.path.basename(filename),
+            rows=rows,
+            bytes=size,
+            checksum=file_checksum(filename),
+        )
+        return filename
+
+    def write_period(self, period, description, batches):
+        if self.dataset:
+            with self.metrics.phase("serialize"):
+                rows, size = self.dataset.write(period, description, batches, commit=self.commit_file)
+            self.metrics.count(rows, size)
+            return self.record_complete(period, self.dataset.partition_path(period), rows, size)
+
+        batches = RowCounter(batches)
+
+        def write_rows(filename):
+            self.write(filename, description, batches)
+            return batches.rows
+
+        return self.commit_period(period, write_rows)
+
+    def unload_period(self, conn, period):
+        params = self.report.params(period)
+        with conn.cursor() as cursor, self.metrics.phase("execute"):
+            # UNLOAD returns no result set, so fetch the column description separately
+            cursor.execute(f"SELECT * FROM ({self.query}) AS unload_columns LIMIT 0", params)
+            description = cursor.description
+            manifest = self.unloader.unload(cursor, self.query, params, f"{self.report.name}/{period.label}")
+
+        if self.output_format == "csv" and not self.dataset:
+            # Copy the parts' bytes straight through instead of re-encoding every row
+            def merge(filename):
+                with open(filename, "wb") as out:
+                    return self.unloader.merge_csv(manifest, csv_header(description), out)
+
+            return self.commit_period(period, merge)
+        rows = self.unloader.read_rows(manifest, description)
+        return self.write_period(period, description, self.metrics.timed(rebatch(rows, self.fetch_size), "fetch"))
+
+    def copy_period(self, conn, period):
+        params = self.report.params(period)
+        with conn.cursor() as cursor:
+            bound_query = cursor.mogrify(self.query, params).decode("utf-8")
+            statement = f"COPY ({bound_query}) TO STDOUT WITH (FORMAT CSV, HEADER)"
+
+            def copy(filename):
+                with open_csv_bytes(filename, self.output_format, self.compression_level) as out:
+                    # The server runs the query while streaming, so it all counts as fetching
+                    with self.metrics.phase("fetch"):
+                        cursor.copy_expert(statement, out, size=1 << 20)
+                return cursor.rowcount
+
+            return self.commit_period(period, copy)
+
+    def check_copy(self):
+        """Decide once, before any window runs, whether the server supports ``COPY TO STDOUT``.
+
+        Without it every period is exported and recorded through the cursor
+        path; with it, a period whose ``COPY`` fails is retried and recorded
+        failed like any other.
+        """
+
+        def attempt():
+            with self.connections.connection() as conn, conn.cursor() as cursor:
+                try:
+                    cursor.copy_expert("COPY (SELECT 1) TO STDOUT WITH (FORMAT CSV, HEADER)", io.BytesIO())
+                except COPY_ERRORS as e:
+                    reason = str(e).strip().splitlines()[0]
+                    print(f"COPY TO STDOUT is unsupported ({reason}), exporting {self.report.name} by cursor")
+                    self.copy_supported = False
+                    conn.rollback()
+
+        self.connections.retry(attempt, f"Checking COPY support for {self.report.name}")
+
+    def export_window(self, window):
+        span = Period(window[0].start, window[-1].end)
+        if len(window) == 1:
+            print(f"Exporting {self.report.name} for {span.label}")
+        else:
+            print(f"Exporting {self.report.name} for {window[0].label} to {span.label}")
+        written = []
+
+        def attempt():
+            written.clear()
+            if self.export_cached(window, written):
+                return
+            started = time.perf_counter()
+            with self.connections.connection(self.shared_keys(window)) as conn:
+                self.metrics.add("connect", time.perf_counter() - started)
+                self.export_window_on(conn, window, written)
+
+        try:
+            source = "unload" if self.backend == "unload" else "copy" if self.copy_supported else "query"
+            with self.metrics.window(window, source):
+                self.connections.retry(attempt, f"Exporting {self.report.name} for {span.label}")
+        except Exception:
+            for period in window[len(written):]:
+                self.manifest.record(period.label, status="failed", query_hash=self.output_hash)
+            raise
+        return written
+
+    def shared_keys(self, window):
+        """Keys of the shared table rows the query reads to export ``window``."""
+        params = self.report.params(Period(window[0].start, window[-1].end))
+        return tuple(table.key(params) for table in self.shared_tables)
+
+    def cacheable(self, window):
+        return self.cache is not None and self.backend == "cursor" and not self.is_recent(window[-1])
+
+    def export_cached(self, window, written):
+        """Write ``window`` from the result cache, returning False if it is not cached."""
+        if not self.cacheable(window):
+            return False
+        params = self.report.params(Period(window[0].start, window[-1].end))
+        try:
+            cached = self.cache.get(self.query_hash, params)
+            if cached is None:
+                return False
+            self.metrics.current().source = "cache"
+            description, batches = cached
+            self.write_window(window, description, self.metrics.timed(batches, "fetch"), written)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print(f"Discarding unreadable cached result for {self.report.name} ({e}), querying instead")
+            self.cache.discard(self.query_hash, params)
+            self.metrics.current().source = "query"
+            written.clear()
+            return False
+        return True
+
+    def write_window(self, window, description, batches, written):
+        """Write the rows of ``window`` to its periods' files, appending each finished file to ``written``."""
+        if len(window) == 1:
+            written.append(self.write_period(window[0], description, batches))
+            return
+        index = [desc[0] for desc in description].index(self.report.split_column)
+        for period, period_batches in split_by_period(batches, index, window, self.fetch_size):
+            written.append(self.write_period(period, description, period_batches))
+
+    def previous_result(self, period):
+        """The saved result of the period before ``period`` as ``(description, rows)``, or None."""
+        params = self.report.params(previous_period(self.report.cadence, period))
+        try:
+            cached = self.delta_state.get(self.query_hash, params)
+            if cached is None:
+                return None
+            description, batches = cached
+            return description, [row for rows in batches for row in rows]
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print(f"Discarding unreadable previous result for {self.report.name} ({e}), running the full query")
+            self.delta_state.discard(self.query_hash, params)
+            return None
+
+    def full_refresh_due(self, span):
+        """Whether ``span`` holds a day ``delta_full_days`` apart from the report's start, so it runs the full query."""
+        if not self.delta_full_days:
+            return False
+        first = (span.start - self.report.start_date).days
+        last = (span.end - self.report.start_date).days
+        return last // self.delta_full_days != (first - 1) // self.delta_full_days
+
+    def prune_delta_state(self, span):
+        """Discard the newest saved result before ``span`` that no later period starts from.
+
+        Recent periods are exported again by later runs, so the results of
+        the periods before them are kept.
+        """
+        after, period = span, previous_period(self.report.cadence, span)
+        while self.is_recent(after):
+            after, period = period, previous_period(self.report.cadence, period)
+        self.delta_state.discard(self.query_hash, self.report.params(period))
+
+    def observe_queue_depth(self, depth):
+        self.metrics.observe("queue_depth", depth)
+
+    def export_window_on(self, conn, window, written):
+        """Export ``window`` over ``conn``, appending each finished file to ``written``."""
+        with self.metrics.phase("prepare"):
+            self.connections.prepare(conn, self.session_tables)
+        if self.backend == "unload":
+            written.append(self.unload_period(conn, window[0]))
+            return
+        if self.copy_supported:
+            written.append(self.copy_period(conn, window[0]))
+            return
+        span = Period(window[0].start, window[-1].end)
+        params = self.report.params(span)
+        if self.client_rollup:
+            self.metrics.current().source = "rollup"
+            with self.metrics.phase("execute"):
+                description, rows = self.report.rollup(conn, params, self.fetch_size)
+            batches = rebatch(rows, self.fetch_size)
+            if self.cacheable(window):
+                batches = self.cache.store(self.query_hash, params, description, batches)
+            self.write_window(window, description, batches, written)
+            return
+        query, query_params = self.query, params
+        if self.shared_tables:
+            with self.metrics.phase("prepare"):
+                query_params = self.connections.prepare_shared(conn, self.shared_tables, params)
+        previous = self.previous_result(span) if self.delta_state and not self.full_refresh_due(span) else None
+        if previous is not None:
+            self.metrics.current().source = "delta"
+            query = self.delta_query
+            previous_params = self.report.params(previous_period(self.report.cadence, span))
+            query_params = dict(params, **{f"previous_{name}": value for name, value in previous_params.items()})
+        cursor = self.cursor(conn, span)
+        try:
+            with self.metrics.phase("execute"):
+                cursor.execute(query, query_params)
+
+            # Fetch the first batch (server-side cursors only have a description after a fetch)
+            with self.metrics.phase("first_row"):
+                first = cursor.fetchmany(self.fetch_size)
+            batches = fetch_batches(cursor, self.fetch_size, first)
+            if self.pipeline_depth > 0:
+                prefetch = Prefetcher(batches, self.pipeline_depth, self.observe_queue_depth)
+            else:
+                prefetch = nullcontext(batches)
+            with prefetch as batches:
+                batches = self.metrics.timed(batches, "fetch")
+                description = cursor.description
+                if previous is not None:
+                    description, batches = carry_forward(
+                        description, batches, previous, self.report.delta_key, self.report.carried_columns
+                    )
+                if self.delta_state:
+                    batches = self.delta_state.store(self.query_hash, params, description, batches)
+                if self.cacheable(window):
+                    batches = self.cache.store(self.query_hash, params, description, batches)
+                self.write_window(window, description, batches, written)
+        finally:
+            cursor.close()
+        if self.delta_state:
+            self.prune_delta_state(span)
+
+    def capture_plan(self, window):
+        """Record the plan of the query that exports ``window`` and print any warnings about it."""
+        span = Period(window[0].start, window[-1].end)
+
+        def attempt():
+            with self.connections.connection(self.shared_keys(window)) as conn:
+                self.connections.prepare(conn, self.session_tables)
+                params = self.connections.prepare_shared(conn, self.shared_tables, self.report.params(span))
+                with conn.cursor() as cursor:
+                    return explain(cursor, self.query, params)
+
+        lines = self.connections.retry(attempt, f"Explaining {self.report.name} for {span.label}")
+        for warning in self.plans.record(span.label, query_hash(self.query), lines):
+            print(f"Plan warning for {self.report.name}: {warning}")
+
+    def export_windows(self, windows):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self.export_window, windows)
+            return [filename for written in results for filename in written]
+
+    def plan(self, start_date=None, end_date=None):
+        """Start a run from ``start_date`` to ``end_date`` and return the windows it needs to export."""
+        default_start, default_end = self.report.default_range()
+        todo = periods(self.report.cadence, start_date or default_start, end_date or default_end)
+        if self.copy_supported:
+            self.check_copy()
+        todo = [period for period in todo if self.needs_export(period)]
+        self.metrics = RunMetrics(self.report.name, self.timings_path)
+        return self.windows(todo)
+
+    def run(self, start_date=None, end_date=None):
+        windows = self.plan(start_date, end_date)
+        try:
+            if self.plans and windows:
+                self.capture_plan(windows[0])
+            return self.export_windows(windows)
+        finally:
+            self.close()
+            self.metrics.finish()
+
+
+def exporter_class(engine=None):
+    """The exporter class of ``engine`` (``EXPORT_ENGINE`` by default).
+
+    ``"sync"`` is the synchronous engine, ``"async"`` the asyncio one and
+    ``"snapshot"`` queries a local snapshot of the report's source tables
+    instead of the cluster.
+    """
+    engine = engine or os.getenv("EXPORT_ENGINE", "sync")
+    if engine == "async":
+        from .async_engine import AsyncExporter
+
+        return AsyncExporter
+    if engine == "snapshot":
+        from .snapshot import SnapshotExporter
+
+        return SnapshotExporter
+    if engine == "sync":
+        return Exporter
+    raise ValueError(f"Unknown engine {engine!r}, expected 'sync', 'async' or 'snapshot'")
+
+
+def run_report(name, start_date=None, end_date=None, engine=None, **overrides):
+    """Export a registered report with ``engine`` using the ``EXPORT_*`` environment settings."""
+    return exporter_class(engine).from_env(get_report(name), **overrides).run(start_date, end_date)
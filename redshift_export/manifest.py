@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+
+def query_hash(query):
+    """Hash of the query with whitespace normalized, so re-indenting SQL does not invalidate exports."""
+    normalized = re.sub(r"\s+", " ", query).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def export_hash(query, backend="cursor"):
+    """Hash an export is recorded under: the query's, qualified by backends whose files spell values differently."""
+    if backend == "cursor":
+        return query_hash(query)
+    return hashlib.sha256(f"{backend}:{query_hash(query)}".encode("utf-8")).hexdigest()
+
+
+def file_checksum(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Record of the periods a report has exported, stored as JSON next to the exports.
+
+    Each entry is keyed by period label and holds the query hash, row and
+    byte counts, file checksum, completion time and status of the last
+    export.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_current(self, label, query_hash, output):
+        entry = self.entries.get(label)
+        return (
+            entry is not None
+            and entry.get("status") == "complete"
+            and entry.get("query_hash") == query_hash
+            and entry.get("output") == os.path.basename(output)
+            and os.path.exists(output)
+        )
+
+    def record(self, label, **entry):
+        entry["completed_at"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.entries[label] = entry
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.filename)
@@ -0,0 +1,230 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Phases in the order an export goes through them
+PHASES = ("connect", "prepare", "execute", "first_row", "fetch", "serialize", "fsync")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class WindowTimings:
+    """Time spent in each phase while exporting one window, with its row and byte counts.
+
+    Phases nest (fetching happens while the writer pulls rows), so each
+    phase records its self time: time spent in phases nested inside it is
+    only counted for the inner phase.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.phases = defaultdict(float)
+        self.rows = 0
+        self.bytes = 0
+        # Sampled values such as the prefetch queue depth, as [samples, total, max]
+        self.gauges = {}
+        self._inner = [0.0]
+
+    def observe(self, name, value):
+        gauge = self.gauges.setdefault(name, [0, 0, value])
+        gauge[0] += 1
+        gauge[1] += value
+        gauge[2] = max(gauge[2], value)
+
+    def record(self, name, seconds):
+        """Add time measured outside the phase nesting, e.g. on another thread than the writer's."""
+        self.phases[name] += seconds
+
+    def add(self, name, seconds):
+        self.record(name, seconds)
+        self._inner[-1] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        self._inner.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            inner = self._inner.pop()
+            self.add(name, elapsed - inner)
+            # The parent's self time excludes the inner phase's time as well as this one's
+            self._inner[-1] += inner
+
+    def timed(self, batches, name):
+        """Pass ``batches`` through, timing how long producing each batch takes as ``name``."""
+        batches = iter(batches)
+        while True:
+            with self.phase(name):
+                rows = next(batches, None)
+            if rows is None:
+                return
+            yield rows
+
+
+class RunMetrics:
+    """Collects the timings of every window a report export runs.
+
+    Each finished window is appended to ``log_path`` as a JSON line, and
+    ``finish`` appends and prints an end-of-run summary with p50/p95/max per
+    phase, the mean and max of gauges such as the prefetch queue depth, and
+    overall throughput. The window being exported is tracked per thread, so
+    ``phase`` and ``timed`` can be called anywhere below ``window`` without
+    passing the timings around.
+    """
+
+    def __init__(self, report_name, log_path=None):
+        self.report_name = report_name
+        self.log_path = log_path
+        self.windows = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def current(self):
+        return getattr(self._local, "timings", None)
+
+    @contextmanager
+    def window(self, window, source):
+        """Track ``window`` as the current thread's window."""
+        with self.track(window, source) as timings, self.attach(timings):
+            yield timings
+
+    @contextmanager
+    def attach(self, timings):
+        """Make ``timings`` the current thread's window, e.g. in a thread writing a window's files."""
+        previous = self.current()
+        self._local.timings = timings
+        try:
+            yield timings
+        finally:
+            self._local.timings = previous
+
+    @contextmanager
+    def track(self, window, source):
+        """Time ``window`` and log it when the block exits."""
+        timings = WindowTimings(source)
+        started = time.perf_counter()
+        status = "failed"
+        try:
+            yield timings
+            status = "complete"
+        finally:
+            self.log(
+                {
+                    "event": "window",
+                    "report": self.report_name,
+                    "start": window[0].start.strftime("%Y-%m-%d"),
+                    "end": window[-1].label,
+                    "periods": len(window),
+                    "status": status,
+                    "source": timings.source,
+                    "seconds": round(time.perf_counter() - started, 6),
+                    "rows": timings.rows,
+                    "bytes": timings.bytes,
+                    "phases": {name: round(seconds, 6) for name, seconds in timings.phases.items()},
+                    "gauges": {
+                        name: {"mean": round(total / samples, 3), "max": peak}
+                        for name, (samples, total, peak) in timings.gauges.items()
+                    },
+                }
+            )
+
+    def phase(self, name):
+        timings = self.current()
+        return timings.phase(name) if timings else nullcontext()
+
+    def add(self, name, seconds):
+        timings = self.current()
+        if timings:
+            timings.add(name, seconds)
+
+    def timed(self, batches, name):
+        timings = self.current()
+        return timings.timed(batches, name) if timings else batches
+
+    def observe(self, name, value):
+        timings = self.current()
+        if timings:
+            timings.observe(name, value)
+
+    def count(self, rows, size=0):
+        """Add a written file's rows and size in bytes to the current window."""
+        timings = self.current()
+        if timings:
+            timings.rows += rows
+            timings.bytes += size
+
+    def log(self, entry):
+        entry["at"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            if entry["event"] == "window":
+                self.windows.append(entry)
+            if self.log_path:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def summary(self):
+        seconds = time.perf_counter() - self.started
+        complete = [entry for entry in self.windows if entry["status"] == "complete"]
+        rows = sum(entry["rows"] for entry in complete)
+        size = sum(entry["bytes"] for entry in complete)
+        phases = {}
+        for name in PHASES:
+            values = [entry["phases"][name] for entry in complete if name in entry["phases"]]
+            if values:
+                phases[name] = {
+                    "p50": round(percentile(values, 0.5), 6),
+                    "p95": round(percentile(values, 0.95), 6),
+                    "max": round(max(values), 6),
+                }
+        gauges = {}
+        for entry in complete:
+            for name, gauge in entry["gauges"].items():
+                gauges.setdefault(name, []).append(gauge)
+        return {
+            "event": "summary",
+            "report": self.report_name,
+            "windows": len(complete),
+            "failed": len(self.windows) - len(complete),
+            "seconds": round(seconds, 6),
+            "rows": rows,
+            "bytes": size,
+            "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+            "bytes_per_second": round(size / seconds, 1) if seconds else 0.0,
+            "phases": phases,
+            "gauges": {
+                name: {
+                    "mean": round(sum(gauge["mean"] for gauge in values) / len(values), 3),
+                    "max": max(gauge["max"] for gauge in values),
+                }
+                for name, values in gauges.items()
+            },
+        }
+
+    def finish(self):
+        summary = self.summary()
+        self.log(dict(summary))
+        print(
+            f"{self.report_name}: {summary['windows']} windows ({summary['failed']} failed), "
+            f"{summary['rows']} rows, {summary['bytes']} bytes in {summary['seconds']:.1f}s "
+            f"({summary['rows_per_second']:.0f} rows/s, {summary['bytes_per_second']:.0f} bytes/s)"
+        )
+        if summary["phases"]:
+            print(f"  {'phase':<10} {'p50 s':>9} {'p95 s':>9} {'max s':>9}")
+            for name, stats in summary["phases"].items():
+                print(f"  {name:<10} {stats['p50']:>9.3f} {stats['p95']:>9.3f} {stats['max']:>9.3f}")
+        for name, gauge in summary["gauges"].items():
+            print(f"  {name}: mean {gauge['mean']:.2f}, max {gauge['max']}")
+        return summary
@@ -0,0 +1,119 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Plan steps that turn a query that normally takes seconds into one that takes minutes when the planner
+# picks them: nested loops (including Redshift's Cartesian product warning) and redistributing or
+# broadcasting a join's inner table to every node.
+RISKY_STEPS = ("Nested Loop", "DS_BCAST_INNER", "DS_DIST_BOTH", "DS_DIST_ALL_INNER")
+
+_COST = re.compile(r"cost=([\d.]+)\.\.([\d.]+)")
+_ESTIMATES = re.compile(r"\s*\(cost=[^)]*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def explain(cursor, query, params):
+    """Return the lines of the ``EXPLAIN`` output for ``query`` bound to ``params``."""
+    cursor.execute(f"EXPLAIN {query}", params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def plan_cost(lines):
+    """Total estimated cost of the plan's top node."""
+    for line in lines:
+        match = _COST.search(line)
+        if match:
+            return float(match.group(2))
+    return None
+
+
+def plan_shape(lines):
+    """The plan without estimates, literals and numbers, which change with the parameters but not the plan."""
+    shape = []
+    for line in lines:
+        line = _ESTIMATES.sub("", line)
+        line = _LITERAL.sub("?", line)
+        shape.append(_NUMBER.sub("N", line).rstrip())
+    return shape
+
+
+def risky_steps(shape):
+    return [line.strip().lstrip("->").strip() for line in shape if any(step in line for step in RISKY_STEPS)]
+
+
+def diff(old, new, limit=40):
+    lines = list(difflib.unified_diff(old, new, "previous", "current", lineterm="", n=1))
+    return "\n".join(lines[:limit] + (["..."] if len(lines) > limit else []))
+
+
+class PlanHistory:
+    """Plans captured for a report, stored next to its exports.
+
+    The latest plan is written as text to ``<name>.plan.txt`` and every
+    capture is appended to ``<name>.plans.json`` with its estimated cost,
+    the plan's shape and its risky steps. ``record`` compares a
+    new plan with the previous capture of the same query and returns
+    warnings when the plan changed, its cost grew by more than
+    ``cost_ratio`` or it gained nested-loop or broadcast steps (all of a
+    query's risky steps are reported on its first capture).
+    """
+
+    def __init__(self, directory, report_name, cost_ratio=2.0, keep=20):
+        self.text_path = os.path.join(directory, f"{report_name}.plan.txt")
+        self.filename = os.path.join(directory, f"{report_name}.plans.json")
+        self.cost_ratio = cost_ratio
+        self.keep = keep
+        self._lock = threading.Lock()
+        self.entries = []
+        if os.path.exists(self.filename):
+            with open(self.filename, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def record(self, label, query_hash, lines):
+        shape = plan_shape(lines)
+        entry = {
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "period": label,
+            "query_hash": query_hash,
+            "plan_hash": hashlib.sha256("\n".join(shape).encode("utf-8")).hexdigest(),
+            "cost": plan_cost(lines),
+            "risky_steps": risky_steps(shape),
+            "shape": shape,
+        }
+        with self._lock:
+            same_query = [previous for previous in self.entries if previous["query_hash"] == query_hash]
+            previous = same_query[-1] if same_query else None
+            entry["warnings"] = self._compare(previous, entry)
+            self.entries = (self.entries + [entry])[-self.keep:]
+            self._save(lines)
+        return entry["warnings"]
+
+    def _compare(self, previous, entry):
+        warnings = []
+        new_steps = Counter(entry["risky_steps"]) - Counter(previous["risky_steps"] if previous else [])
+        if new_steps:
+            warnings.append("risky plan steps: " + "; ".join(f"{count} x {step}" for step, count in new_steps.items()))
+        if previous is None:
+            return warnings
+        if previous["plan_hash"] != entry["plan_hash"]:
+            warnings.append(f"plan changed since {previous['captured_at']}:\n" + diff(previous["shape"], entry["shape"]))
+        if previous["cost"] and entry["cost"] and entry["cost"] > previous["cost"] * self.cost_ratio:
+            warnings.append(f"estimated cost rose from {previous['cost']:.0f} to {entry['cost']:.0f}")
+        return warnings
+
+    def _save(self, lines):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        for path, content in (
+            (self.text_path, "\n".join(lines) + "\n"),
+            (self.filename, json.dumps(self.entries, indent=2, sort_keys=True)),
+        ):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
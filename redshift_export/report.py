@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+from .cadence import Period
+
+
+def bind_date(period: Period):
+    """Default parameter binding: the report's ``%(date)s`` is the first day of the period."""
+    return {"date": period.start}
+
+
+def bind_range(period: Period):
+    """Bind ``%(start_date)s`` and ``%(end_date)s`` to the first and last day of the period."""
+    return {"start_date": period.start, "end_date": period.end}
+
+
+@dataclass(frozen=True)
+class SessionTable:
+    """Date-independent result materialized once per connection as ``CREATE TEMP TABLE <name> AS <query>``."""
+
+    name: str
+    query: str
+
+
+@dataclass(frozen=True)
+class SharedTable:
+    """Per-date result several reports read, materialized into the temp table ``<name>`` once per distinct parameters.
+
+    ``bind`` maps a reading report's query parameters to the parameters of
+    ``query``. Its result has a column named after each parameter holding
+    the bound value, so rows for several parameters can share the table
+    and readers select theirs by those columns. ``query`` may read the
+    temp tables in ``session_tables``.
+    """
+
+    name: str
+    query: str
+    bind: Callable[[dict], dict]
+    session_tables: Tuple[SessionTable, ...] = ()
+
+    def key(self, params):
+        """Identifies the rows a report bound to ``params`` reads, equal for every report reading the same rows."""
+        return self.name, tuple(sorted(self.bind(params).items()))
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """Source table copied into a local snapshot as the rows of ``query`` for the snapshot's date range."""
+
+    name: str
+    query: str
+
+
+@dataclass(frozen=True)
+class Report:
+    """Definition of an exported report.
+
+    ``filename`` is formatted with the period label as ``{date}`` and gets the
+    output format's extension appended. ``output_dir`` is relative to the
+    exports directory.
+
+    ``bind`` maps the period being queried to the query parameters. Reports
+    whose query accepts a multi-period range set ``split_column`` to the
+    result column holding each row's date; the query must order its rows by
+    that column so they can be split into per-period files. Reports whose
+    rows aggregate whole periods of their ``cadence`` whatever the bound
+    range, such as calendar months, set ``fixed_cadence`` so they are never
+    exported by another cadence.
+
+    ``precomputed_query`` is an equivalent form of ``query`` that reads from
+    the temp tables in ``session_tables`` instead of recomputing them, used
+    when the exporter runs with precomputation enabled.
+
+    ``delta_query`` lets delta exports build on the previous period's
+    result. It binds the previous period's parameters with a ``previous_``
+    prefix (e.g. ``%(previous_date)s``), recomputes ``carried_columns`` only
+    for the rows whose inputs changed since then and ends with a boolean
+    ``recomputed`` column. The other rows take ``carried_columns`` from the
+    previous period's row with the same ``delta_key``. It may read the
+    temp tables in ``session_tables``.
+
+    ``shared_query`` is an equivalent form of ``query`` that reads per-date
+    results from ``shared_tables``, so reports exported together compute
+    them once and share them. It binds each shared table's parameters as
+    well as the report's own, and may read the temp tables in
+    ``session_tables``.
+
+    ``snapshot_tables`` are the narrow source tables ``query`` reads,
+    which can be copied once into a local snapshot so the report is
+    re-run or re-aggregated without the cluster. Their queries are bound
+    to the parameters of the whole snapshot range.
+
+    ``rollup`` computes the rows of ``query`` in-process: called with a
+    connection, the query parameters and the fetch size, it fetches
+    narrower results, aggregates them client-side and returns
+    ``(description, rows)`` ordered like the query's rows.
+    """
+
+    name: str
+    query: str
+    output_dir: str
+    filename: str
+    start_date: datetime
+    end_date: Optional[datetime] = None
+    cadence: str = "daily"
+    bind: Callable[[Period], dict] = field(default=bind_date)
+    split_column: Optional[str] = None
+    fixed_cadence: bool = False
+    precomputed_query: Optional[str] = None
+    session_tables: Tuple[SessionTable, ...] = ()
+    delta_query: Optional[str] = None
+    delta_key: Optional[str] = None
+    carried_columns: Tuple[str, ...] = ()
+    shared_query: Optional[str] = None
+    shared_tables: Tuple[SharedTable, ...] = ()
+    snapshot_tables: Tuple[SnapshotTable, ...] = ()
+    rollup: Optional[Callable[[Any, dict, int], Tuple[list, list]]] = None
+
+    def params(self, period: Period):
+        return self.bind(period)
+
+    def default_range(self):
+        return self.start_date, self.end_date or datetime.now()
+
+
+REPORTS = {}
+
+
+def register(report: Report):
+    if report.name in REPORTS:
+        raise ValueError(f"Report {report.name!r} is already registered")
+    REPORTS[report.name] = report
+    return report
+
+
+def get_report(name):
+    if name not in REPORTS:
+        raise KeyError(f"Unknown report {name!r}, expected one of {sorted(REPORTS)}")
+    return REPORTS[name]
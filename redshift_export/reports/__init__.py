@@ -0,0 +1,7 @@
+# Importing the report modules registers them
+from . import (  # noqa: F401
+    asin_usage_daily,
+    asin_usage_monthly,
+    daily_billing_entity_ad_data,
+    daily_org_resource_report,
+)
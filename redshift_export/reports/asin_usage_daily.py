@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta
+
+from ..cadence import last_day_of_month
+from ..report import Report, register
+from .segment_versions import (
+    FIRST_SEGMENT_VERSION,
+    precomputed_first_versions,
+    segment_asin_usage,
+    shared_asin_usage,
+)
+
+# Start and end of the month containing %(date)s
+MONTH_START = "date_trunc('month', %(date)s)"
+MONTH_END = "date_trunc('month', %(date)s) + interval '1 month' - interval '1 second'"
+
+# ASINs counted per organization over the month of %(date)s
+ASINS_PER_ORG = """asins_per_org AS (SELECT segment.organization_id,
+                              org.name,
+                              org.salesforce_id,
+                              org.asin_cap,
+                              count(DISTINCT sv.product_id) asin_count
+                       FROM api_app_segment_version sv
+                                INNER JOIN api_app_segment segment ON (sv.segment_id = segment.id)
+                                INNER JOIN api_app_organization org ON org.id = segment.organization_id
+                       WHERE (segment.is_demo = 0 AND
+                              (sv.inactive_at IS NULL OR
+                               sv.inactive_at > date_trunc('month', %(date)s)) AND
+                              sv.created_at <=
+                              date_trunc('month', %(date)s) + interval '1 month' - interval '1 second' AND
+                              NOT (sv.product_id IN (SELECT DISTINCT inactive_version.product_id
+                                                     FROM api_app_segment_version inactive_version
+                                                              INNER JOIN api_app_segment segment_1
+                                                                         ON (inactive_version.segment_id = segment_1.id)
+                                                     WHERE (segment_1.is_demo = 0 AND
+                                                            inactive_version.inactive_at >=
+                                                            date_trunc('month', %(date)s) AND
+                                                            inactive_version.inactive_at <=
+                                                            date_trunc('month', %(date)s) + interval '1 month' -
+                                                            interval '1 second'))) AND
+                              NOT (sv.product_id IN (SELECT DISTINCT paused_version.product_id
+                                                     FROM api_app_segment_version paused_version
+                                                              INNER JOIN api_app_segment segment_2
+                                                                         ON (paused_version.segment_id = segment_2.id)
+                                                     WHERE (segment_2.is_demo = 0 AND
+                                                            (paused_version.inactive_at IS NULL OR
+                                                             paused_version.inactive_at >
+                                                             date_trunc('month', %(date)s)) AND
+                                                            paused_version.created_at <=
+                                                            date_trunc('month', %(date)s) + interval '1 month' -
+                                                            interval '1 second' AND
+                                                            paused_version.paused_at <
+                                                            date_trunc('month', %(date)s) AND
+                                                            (paused_version.inactive_at IS NULL OR
+                                                             paused_version.inactive_at >
+                                                             date_trunc('month', %(date)s) + interval '1 month' - interval '1 second')
+                                                            AND NOT (paused_version.version_id IN ({paused_first_versions})))) AND
+                                   sv.segment_id IN (SELECT DISTINCT paused_version_1.segment_id
+                                                     FROM api_app_segment_version paused_version_1
+                                                              INNER JOIN api_app_segment segment_5
+                                                                         ON (paused_version_1.segment_id = segment_5.id)
+                                                     WHERE (segment_5.is_demo = 0 AND
+                                                            (paused_version_1.inactive_at IS NULL OR
+                                                             paused_version_1.inactive_at >
+                                                             date_trunc('month', %(date)s)) AND
+                                                            paused_version_1.created_at <=
+                                                            date_trunc('month', %(date)s) + interval '1 month' -
+                                                            interval '1 second' AND
+                                                            paused_version_1.paused_at <
+                                                            date_trunc('month', %(date)s) AND
+                                                            (paused_version_1.inactive_at IS NULL OR
+                                                             paused_version_1.inactive_at >
+                                                             date_trunc('month', %(date)s) +
+                                                             interval '1 month' -
+                                                             interval '1 second') AND
+                                                            NOT (paused_version_1.version_id IN
+                                                                 ({paused_segment_first_versions}))))) AND
+                              NOT (sv.version_id IN ({first_versions})))
+                       GROUP BY segment.organization_id,
+                                org.name,
+                                org.salesforce_id,
+                                org.asin_cap
+                       ORDER BY segment.organization_id)"""
+
+# The first live version subqueries as the default query has always spelled them, so its hash and the
+# exports recorded under it stay valid
+CORRELATED_PAUSED_FIRST_VERSIONS = """SELECT version.version_id
+                                                                                               FROM api_app_segment_version version
+                                                                                                        INNER JOIN api_app_segment segment_3
+                                                                                                                   ON (version.segment_id = segment_3.id)
+                                                                                               WHERE (segment_3.is_demo =
+                                                                                                      0 AND
+                                                                                                      (version.inactive_at IS NULL OR
+                                                                                                       version.inactive_at >
+                                                                                                       date_trunc('month', %(date)s)) AND
+                                                                                                      version.created_at <=
+                                                                                                      date_trunc('month', %(date)s) +
+                                                                                                      interval '1 month' -
+                                                                                                      interval '1 second' AND
+                                                                                                      segment_3.cobalt_segment_id IS NOT NULL AND
+                                                                                                      version.created_at =
+                                                                                                      (SELECT migrated_version.created_at
+                                                                                                       FROM api_app_segment_version migrated_version
+                                                                                                         INNER JOIN api_app_segment segment_4
+                                                                                                           ON migrated_version.segment_id = segment_4.id
+                                                                                                       WHERE (segment_4.is_demo =
+                                                                                                              0 AND
+                                                                                                              (migrated_version.inactive_at IS NULL OR
+                                                                                                               migrated_version.inactive_at >
+                                                                                                               date_trunc('month', %(date)s)) AND
+                                                                                                              migrated_version.created_at <=
+                                                                                                              date_trunc('month', %(date)s) +
+                                                                                                              interval '1 month' -
+                                                                                                              interval '1 second' AND
+                                                                                                              migrated_version.segment_id =
+                                                                                                              (version.segment_id))
+                                                                                                       ORDER BY migrated_version.created_at ASC
+                                                                                                       LIMIT 1))"""
+
+CORRELATED_PAUSED_SEGMENT_FIRST_VERSIONS = """SELECT migrated_version.version_id
+                                                                  FROM api_app_segment_version migrated_version
+                                                                           INNER JOIN api_app_segment segment_6
+                                                                                      ON (migrated_version.segment_id = segment_6.id)
+                                                                  WHERE (segment_6.is_demo = 0 AND
+                                                                         (migrated_version.inactive_at IS NULL OR
+                                                                          migrated_version.inactive_at >
+                                                                          date_trunc('month', %(date)s)) AND
+                                                                         migrated_version.created_at <=
+                                                                         date_trunc('month', %(date)s) +
+                                                                         interval '1 month' -
+                                                                         interval '1 second' AND
+                                                                         segment_6.cobalt_segment_id IS NOT NULL AND
+                                                                         migrated_version.created_at =
+                                                                         (SELECT sversion.created_at
+                                                                          FROM api_app_segment_version sversion
+                                                                                   INNER JOIN api_app_segment seg
+                                                                                              ON (sversion.segment_id = seg.id)
+                                                                          WHERE (seg.is_demo =
+                                                                                 0 AND
+                                                                                 (sversion.inactive_at IS NULL OR
+                                                                                  sversion.inactive_at >
+                                                                                  date_trunc('month', %(date)s)) AND
+                                                                                 sversion.created_at <=
+                                                                                 date_trunc('month', %(date)s) +
+                                                                                 interval '1 month' -
+                                                                                 interval '1 second' AND
+                                                                                 sversion.segment_id =
+                                                                                 (migrated_version.segment_id))
+                                                                          ORDER BY sversion.created_at ASC
+                                                                          LIMIT 1))"""
+
+CORRELATED_FIRST_VERSIONS = """SELECT mv.version_id
+                                                     FROM api_app_segment_version mv
+                                                              INNER JOIN api_app_segment s
+                                                                         ON (mv.segment_id = s.id)
+                                                     WHERE (s.is_demo = 0 AND
+                                                            (mv.inactive_at IS NULL OR
+                                                             mv.inactive_at > date_trunc('month', %(date)s)) AND
+                                                            mv.created_at <=
+                                                            date_trunc('month', %(date)s) + interval '1 month' -
+                                                            interval '1 second' AND
+                                                            s.cobalt_segment_id IS NOT NULL AND
+                                                            mv.created_at = (SELECT mv1.created_at
+                                                                             FROM api_app_segment_version mv1
+                                                                                      INNER JOIN api_app_segment seg
+                                                                                                 ON (mv1.segment_id = seg.id)
+                                                                             WHERE (seg.is_demo = 0 AND
+                                                                                    (mv1.inactive_at IS NULL OR
+                                                                                     mv1.inactive_at >
+                                                                                     date_trunc('month', %(date)s)) AND
+                                                                                    mv1.created_at <=
+                                                                                    date_trunc('month', %(date)s) +
+                                                                                    interval '1 month' -
+                                                                                    interval '1 second' AND
+                                                                                    mv1.segment_id = (mv.segment_id))
+                                                                             ORDER BY mv1.created_at ASC
+                                                                             LIMIT 1))"""
+
+# Define the query with a parameter for the date
+QUERY_TEMPLATE = """
+WITH enabled_orgs AS (SELECT id,
+                             name,
+                             salesforce_id,
+                             agency_id,
+                             asin_cap
+                      FROM api_app_organization
+                      WHERE enabled = 'true'
+                      AND locked = 0),
+     orgs_with_access_to_segments AS (SELECT organization_id
+                                      FROM api_app_organization_permissions
+                                      WHERE permission_id in (SELECT id
+                                                              FROM auth_permission
+                                                              WHERE codename IN ('feature_manage_org_segments'))
+                                      UNION
+                                      select organizationgroup_id
+                                      from api_app_organizationgroup_permissions
+                                      WHERE permission_id in (SELECT id
+                                                              FROM auth_permission
+                                                              WHERE codename IN ('feature_manage_org_segments'))),
+     segment_org AS (SELECT org.id             AS org_id,
+                            org.name,
+                            org.salesforce_id,
+                            org.agency_id,
+                            org.asin_cap,
+                            CASE
+                                WHEN org.id IN (SELECT organization_id FROM orgs_with_access_to_segments)
+                                    THEN TRUE
+                                ELSE FALSE
+                            END AS has_access_to_segment
+                     FROM enabled_orgs org),
+     segments_per_org AS (
+         SELECT organization_id, COUNT(1)
+         FROM api_app_segment
+         WHERE enabled = 1
+         GROUP BY organization_id
+     ),
+     {asins_per_org}
+SELECT segment_org.org_id,
+       segment_org.name,
+       segment_org.salesforce_id,
+       segment_org.agency_id,
+       segment_org.asin_cap,
+       segment_org.has_access_to_segment,
+       segments_per_org.count as segment_count,
+       asins_per_org.asin_count,
+       %(date)s as date
+FROM segment_org
+         LEFT JOIN asins_per_org ON segment_org.org_id = asins_per_org.organization_id
+         LEFT JOIN segments_per_org ON segment_org.org_id = segments_per_org.organization_id
+ORDER BY segment_org.has_access_to_segment DESC, segment_org.name
+        """
+
+QUERY = QUERY_TEMPLATE.format(
+    asins_per_org=ASINS_PER_ORG.format(
+        paused_first_versions=CORRELATED_PAUSED_FIRST_VERSIONS,
+        paused_segment_first_versions=CORRELATED_PAUSED_SEGMENT_FIRST_VERSIONS,
+        first_versions=CORRELATED_FIRST_VERSIONS,
+    )
+)
+
+# Same query reading the first migrated segment versions from the precomputed temp table
+PRECOMPUTED_FIRST_VERSIONS = precomputed_first_versions(MONTH_START, MONTH_END)
+PRECOMPUTED_QUERY = QUERY_TEMPLATE.format(
+    asins_per_org=ASINS_PER_ORG.format(
+        paused_first_versions=PRECOMPUTED_FIRST_VERSIONS,
+        paused_segment_first_versions=PRECOMPUTED_FIRST_VERSIONS,
+        first_versions=PRECOMPUTED_FIRST_VERSIONS,
+    )
+)
+
+# Same query reading the month's ASIN counts from the shared temp table, computed once for every day of the month
+SHARED_QUERY = QUERY_TEMPLATE.format(asins_per_org=f"asins_per_org AS ({shared_asin_usage('asin_count')})")
+
+
+def month_window(params):
+    """The ASIN counts window of %(date)s: from the start of its month to the last second of the month."""
+    month_start = params["date"].replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {"window_start": month_start, "window_end": last_day_of_month(month_start) + timedelta(days=1, seconds=-1)}
+
+
+REPORT = register(
+    Report(
+        name="asin_usage_daily",
+        query=QUERY,
+        precomputed_query=PRECOMPUTED_QUERY,
+        session_tables=(FIRST_SEGMENT_VERSION,),
+        shared_query=SHARED_QUERY,
+        shared_tables=(segment_asin_usage(month_window),),
+        output_dir="",
+        filename="results_{date}",
+        start_date=datetime(2024, 1, 1),
+    )
+)
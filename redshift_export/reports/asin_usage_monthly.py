@@ -0,0 +1,185 @@
+from datetime import datetime
+
+from ..report import Report, bind_range, register
+from .segment_versions import FIRST_SEGMENT_VERSION
+
+# Every month between %(start_date)s and %(end_date)s is computed in one set-based pass over a month
+# spine from api_app_calendar, so a whole window can be exported with a single query and split per month
+# The spine only has the months api_app_calendar has days in: a month missing from the calendar exports a
+# header-only file. benchmarks/bench_monthly_spine.py checks the calendar's coverage and compares the spine
+# with the per-month query it replaced. Rows are dated with the month start, or %(start_date)s in a window
+# starting mid-month, as the per-month query dated them with the period start it was bound to.
+QUERY_TEMPLATE = """
+WITH enabled_orgs AS (SELECT id,
+                             name,
+                             salesforce_id,
+                             agency_id,
+                             asin_cap
+                      FROM api_app_organization
+                      WHERE enabled = 'true'
+                      AND locked = 0),
+     orgs_with_access_to_segments AS (SELECT organization_id
+                                      FROM api_app_organization_permissions
+                                      WHERE permission_id in (SELECT id
+                                                              FROM auth_permission
+                                                              WHERE codename IN ('feature_manage_org_segments'))
+                                      UNION
+                                      select organizationgroup_id
+                                      from api_app_organizationgroup_permissions
+                                      WHERE permission_id in (SELECT id
+                                                              FROM auth_permission
+                                                              WHERE codename IN ('feature_manage_org_segments'))),
+     segment_org AS (SELECT org.id             AS org_id,
+                            org.name,
+                            org.salesforce_id,
+                            org.agency_id,
+                            org.asin_cap,
+                            CASE
+                                WHEN org.id IN (SELECT organization_id FROM orgs_with_access_to_segments)
+                                    THEN TRUE
+                                ELSE FALSE
+                            END AS has_access_to_segment
+                     FROM enabled_orgs org),
+     segments_per_org AS (
+         SELECT organization_id, COUNT(1)
+         FROM api_app_segment
+         WHERE enabled = 1
+         GROUP BY organization_id
+     ),
+     months AS (SELECT DISTINCT date_trunc('month', api_app_calendar.date::timestamp) AS month_start,
+                               date_trunc('month', api_app_calendar.date::timestamp) + interval '1 month' -
+                               interval '1 second'                                 AS month_end
+                FROM api_app_calendar
+                WHERE api_app_calendar.date >= %(start_date)s
+                  AND api_app_calendar.date <= %(end_date)s),
+     -- Versions of non-demo segments that were live at some point of each month
+     active_versions AS (SELECT months.month_start,
+                                months.month_end,
+                                version.version_id,
+                                version.segment_id,
+                                version.product_id,
+                                version.created_at,
+                                version.inactive_at,
+                                version.paused_at,
+                                segment.organization_id,
+                                segment.cobalt_segment_id
+                         FROM months
+                                  INNER JOIN api_app_segment_version version
+                                             ON (version.inactive_at IS NULL OR
+                                                 version.inactive_at > months.month_start) AND
+                                                version.created_at <= months.month_end
+                                  INNER JOIN api_app_segment segment ON (version.segment_id = segment.id)
+                         WHERE segment.is_demo = 0),
+     -- First live version of every migrated (cobalt) segment in each month
+     migrated_versions AS ({migrated_versions}),
+     inactive_products AS (SELECT DISTINCT months.month_start,
+                                           inactive_version.product_id
+                           FROM months
+                                    INNER JOIN api_app_segment_version inactive_version
+                                               ON inactive_version.inactive_at >= months.month_start AND
+                                                  inactive_version.inactive_at <= months.month_end
+                                    INNER JOIN api_app_segment segment_1
+                                               ON (inactive_version.segment_id = segment_1.id)
+                           WHERE segment_1.is_demo = 0),
+     paused_versions AS (SELECT active_versions.month_start,
+                                active_versions.product_id,
+                                active_versions.segment_id
+                         FROM active_versions
+                                  LEFT JOIN migrated_versions
+                                            ON migrated_versions.month_start = active_versions.month_start AND
+                                               migrated_versions.version_id = active_versions.version_id
+                         WHERE active_versions.paused_at < active_versions.month_start
+                           AND (active_versions.inactive_at IS NULL OR
+                                active_versions.inactive_at > active_versions.month_end)
+                           AND migrated_versions.version_id IS NULL),
+     paused_products AS (SELECT DISTINCT month_start, product_id FROM paused_versions),
+     paused_segments AS (SELECT DISTINCT month_start, segment_id FROM paused_versions),
+     asins_per_org AS (SELECT sv.month_start,
+                              sv.organization_id,
+                              org.name,
+                              org.salesforce_id,
+                              org.asin_cap,
+                              count(DISTINCT sv.product_id) asin_count
+                       FROM active_versions sv
+                                INNER JOIN api_app_organization org ON org.id = sv.organization_id
+                                LEFT JOIN inactive_products
+                                          ON inactive_products.month_start = sv.month_start AND
+                                             inactive_products.product_id = sv.product_id
+                                LEFT JOIN paused_products
+                                          ON paused_products.month_start = sv.month_start AND
+                                             paused_products.product_id = sv.product_id
+                                LEFT JOIN paused_segments
+                                          ON paused_segments.month_start = sv.month_start AND
+                                             paused_segments.segment_id = sv.segment_id
+                                LEFT JOIN migrated_versions
+                                          ON migrated_versions.month_start = sv.month_start AND
+                                             migrated_versions.version_id = sv.version_id
+                       WHERE inactive_products.product_id IS NULL
+                         AND (paused_products.product_id IS NULL OR paused_segments.segment_id IS NULL)
+                         AND migrated_versions.version_id IS NULL
+                       GROUP BY sv.month_start,
+                                sv.organization_id,
+                                org.name,
+                                org.salesforce_id,
+                                org.asin_cap)
+SELECT segment_org.org_id,
+       segment_org.name,
+       segment_org.salesforce_id,
+       segment_org.agency_id,
+       segment_org.asin_cap,
+       segment_org.has_access_to_segment,
+       segments_per_org.count as segment_count,
+       asins_per_org.asin_count,
+       GREATEST(months.month_start, %(start_date)s::timestamp) as date
+FROM months
+         CROSS JOIN segment_org
+         LEFT JOIN asins_per_org ON asins_per_org.month_start = months.month_start AND
+                                    segment_org.org_id = asins_per_org.organization_id
+         LEFT JOIN segments_per_org ON segment_org.org_id = segments_per_org.organization_id
+ORDER BY months.month_start, segment_org.has_access_to_segment DESC, segment_org.name
+        """
+
+MIGRATED_VERSIONS = """SELECT active_versions.month_start,
+                                  active_versions.version_id
+                           FROM active_versions
+                                    INNER JOIN (SELECT month_start,
+                                                       segment_id,
+                                                       min(created_at) AS created_at
+                                                FROM active_versions
+                                                GROUP BY month_start, segment_id) first_version
+                                               ON first_version.month_start = active_versions.month_start AND
+                                                  first_version.segment_id = active_versions.segment_id AND
+                                                  first_version.created_at = active_versions.created_at
+                           WHERE active_versions.cobalt_segment_id IS NOT NULL"""
+
+# Same versions looked up in the precomputed temp table
+PRECOMPUTED_MIGRATED_VERSIONS = """SELECT months.month_start,
+                                  first_segment_version.version_id
+                           FROM months
+                                    INNER JOIN first_segment_version
+                                               ON (first_segment_version.inactive_at IS NULL OR
+                                                   first_segment_version.inactive_at > months.month_start) AND
+                                                  first_segment_version.created_at <= months.month_end AND
+                                                  (first_segment_version.blocked_until IS NULL OR
+                                                   first_segment_version.blocked_until <= months.month_start)"""
+
+QUERY = QUERY_TEMPLATE.format(migrated_versions=MIGRATED_VERSIONS)
+
+PRECOMPUTED_QUERY = QUERY_TEMPLATE.format(migrated_versions=PRECOMPUTED_MIGRATED_VERSIONS)
+
+REPORT = register(
+    Report(
+        name="asin_usage_monthly",
+        query=QUERY,
+        precomputed_query=PRECOMPUTED_QUERY,
+        session_tables=(FIRST_SEGMENT_VERSION,),
+        output_dir="monthly",
+        filename="results_{date}",
+        start_date=datetime(2023, 1, 1),
+        end_date=datetime(2023, 12, 31),
+        cadence="monthly",
+        bind=bind_range,
+        split_column="date",
+        fixed_cadence=True,
+    )
+)
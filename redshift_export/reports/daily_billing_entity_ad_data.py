@@ -0,0 +1,209 @@
+from datetime import datetime
+
+from ..report import Report, SnapshotTable, bind_range, register
+from ..rollup import fetch_table, table_rows
+from ..writers import Column, import_pyarrow
+
+# Define the query with parameters for the first and last date
+QUERY = """
+WITH ams_metadata AS
+         (SELECT coalesce(api_app_organization.agency_id, api_app_organization.id) AS billing_entity_id,
+                 billing_entity.name                                               AS billing_entity_name,
+                 billing_entity.locked                                             AS billing_entity_locked,
+                 api_app_calendar.date                                             AS report_date_day,
+                 api_app_campaign.id                                               AS campaign_id
+          FROM api_app_campaign
+                   JOIN
+               (SELECT DISTINCT api_app_account_integration.organization_id     AS organization_id,
+                                api_app_account_integration_profiles.profile_id AS profile_id
+                FROM api_app_account_integration
+                         JOIN api_app_account_integration_profiles ON api_app_account_integration.id =
+                                                                      api_app_account_integration_profiles.account_integration_id
+                WHERE api_app_account_integration_profiles.status = 'active'
+                  AND api_app_account_integration_profiles.selected_status = 'active'
+                  AND api_app_account_integration.active_int = 1) AS distinct_org_profiles
+               ON distinct_org_profiles.profile_id = api_app_campaign.profile_id
+                   JOIN api_app_organization ON distinct_org_profiles.organization_id = api_app_organization.id
+                   JOIN api_app_organization AS billing_entity
+                        ON billing_entity.id = coalesce(api_app_organization.agency_id, api_app_organization.id)
+                   JOIN api_app_calendar ON TRUE
+          WHERE api_app_calendar.date >= %(start_date)s
+            AND api_app_calendar.date <= %(end_date)s
+          GROUP BY coalesce(api_app_organization.agency_id, api_app_organization.id),
+                   billing_entity.name,
+                   billing_entity.locked,
+                   api_app_calendar.date,
+                   api_app_campaign.id
+          ORDER BY campaign_id ASC),
+     ams_facts AS
+         (SELECT api_app_campaign_fact_redshift.report_date                                  AS report_date_day,
+                 api_app_campaign_fact_redshift.campaign_id                                  AS campaign_id,
+                 sum(api_app_campaign_fact_redshift.combined_attributed_sales_14_day *
+                     api_app_currency_conversion.rate)                                       AS attributed_sales_14_day__sum,
+                 sum(api_app_campaign_fact_redshift.cost * api_app_currency_conversion.rate) AS cost__sum
+          FROM api_app_campaign_fact_redshift
+                   JOIN api_app_currency_conversion
+                        ON api_app_currency_conversion.date = api_app_campaign_fact_redshift.report_date
+                            AND api_app_currency_conversion.from_currency_id =
+                                api_app_campaign_fact_redshift.currency_code_id
+          WHERE api_app_currency_conversion.to_currency_id = 'USD'
+            AND api_app_campaign_fact_redshift.report_date >= %(start_date)s
+            AND api_app_campaign_fact_redshift.report_date <= %(end_date)s
+          GROUP BY api_app_campaign_fact_redshift.report_date,
+                   api_app_campaign_fact_redshift.campaign_id),
+     facts_base AS
+         (SELECT ams_metadata.billing_entity_id              AS billing_entity_id,
+                 ams_metadata.billing_entity_name            AS billing_entity_name,
+                 ams_metadata.billing_entity_locked          AS billing_entity_locked,
+                 ams_metadata.report_date_day                AS report_date_day,
+                 sum(ams_facts.attributed_sales_14_day__sum) AS attributed_sales_14_day__sum,
+                 sum(ams_facts.cost__sum)                    AS cost__sum
+          FROM ams_metadata
+                   LEFT OUTER JOIN ams_facts ON ams_metadata.campaign_id = ams_facts.campaign_id
+              AND ams_metadata.report_date_day = ams_facts.report_date_day
+          GROUP BY ams_metadata.billing_entity_id, ams_metadata.billing_entity_name, ams_metadata.billing_entity_locked,
+                   ams_metadata.report_date_day
+          ORDER BY ams_metadata.billing_entity_id ASC NULLS LAST, ams_metadata.report_date_day ASC NULLS LAST,
+                   ams_metadata.billing_entity_name ASC NULLS LAST, ams_metadata.billing_entity_locked ASC NULLS LAST)
+SELECT facts_base.billing_entity_id,
+       facts_base.billing_entity_name,
+       facts_base.billing_entity_locked,
+       facts_base.report_date_day,
+       facts_base.attributed_sales_14_day__sum,
+       facts_base.cost__sum
+FROM facts_base
+WHERE facts_base.attributed_sales_14_day__sum > 0
+   OR facts_base.cost__sum > 0
+ORDER BY facts_base.report_date_day ASC NULLS LAST,
+         facts_base.billing_entity_id ASC NULLS LAST
+        """
+
+# The billing entities each campaign's spend is reported under, as in ams_metadata without the calendar
+CAMPAIGN_BILLING_ENTITIES = """
+SELECT DISTINCT coalesce(api_app_organization.agency_id, api_app_organization.id) AS billing_entity_id,
+                billing_entity.name                                               AS billing_entity_name,
+                billing_entity.locked                                             AS billing_entity_locked,
+                api_app_campaign.id                                               AS campaign_id
+FROM api_app_campaign
+         JOIN
+     (SELECT DISTINCT api_app_account_integration.organization_id     AS organization_id,
+                      api_app_account_integration_profiles.profile_id AS profile_id
+      FROM api_app_account_integration
+               JOIN api_app_account_integration_profiles ON api_app_account_integration.id =
+                                                            api_app_account_integration_profiles.account_integration_id
+      WHERE api_app_account_integration_profiles.status = 'active'
+        AND api_app_account_integration_profiles.selected_status = 'active'
+        AND api_app_account_integration.active_int = 1) AS distinct_org_profiles
+     ON distinct_org_profiles.profile_id = api_app_campaign.profile_id
+         JOIN api_app_organization ON distinct_org_profiles.organization_id = api_app_organization.id
+         JOIN api_app_organization AS billing_entity
+              ON billing_entity.id = coalesce(api_app_organization.agency_id, api_app_organization.id)
+"""
+
+CALENDAR_DAYS = """
+SELECT DISTINCT date AS calendar_date
+FROM api_app_calendar
+WHERE date >= %(start_date)s
+  AND date <= %(end_date)s
+"""
+
+USD_RATES = """
+SELECT date AS rate_date, from_currency_id, rate
+FROM api_app_currency_conversion
+WHERE to_currency_id = 'USD'
+  AND date >= %(start_date)s
+  AND date <= %(end_date)s
+"""
+
+CAMPAIGN_FACTS = """
+SELECT report_date, campaign_id, combined_attributed_sales_14_day, cost, currency_code_id
+FROM api_app_campaign_fact_redshift
+WHERE report_date >= %(start_date)s
+  AND report_date <= %(end_date)s
+"""
+
+
+def rollup(conn, params, fetch_size=10000):
+    """The rows of ``QUERY``, converted to USD and summed per billing entity and day with Arrow.
+
+    The raw facts and rates of the window are fetched once and aggregated
+    in-process, so the cluster only filters rows. Numeric columns with a
+    declared precision stay exact decimals, so the sums match the cluster's.
+    """
+    pa = import_pyarrow()
+    import pyarrow.compute as pc
+
+    entity_columns, entities = fetch_table(conn, CAMPAIGN_BILLING_ENTITIES, params, fetch_size)
+    _, calendar = fetch_table(conn, CALENDAR_DAYS, params, fetch_size)
+    _, rates = fetch_table(conn, USD_RATES, params, fetch_size)
+    _, facts = fetch_table(conn, CAMPAIGN_FACTS, params, fetch_size)
+
+    facts = facts.join(calendar, keys="report_date", right_keys="calendar_date", join_type="left semi")
+    facts = facts.join(
+        rates, keys=["report_date", "currency_code_id"], right_keys=["rate_date", "from_currency_id"], join_type="inner"
+    )
+    facts = facts.join(entities, keys="campaign_id", join_type="inner")
+    keys = ["billing_entity_id", "billing_entity_name", "billing_entity_locked", "report_date"]
+    converted = pa.table(
+        {
+            **{key: facts[key] for key in keys},
+            "sales": pc.multiply_checked(facts["combined_attributed_sales_14_day"], facts["rate"]),
+            "cost": pc.multiply_checked(facts["cost"], facts["rate"]),
+        }
+    )
+    totals = converted.group_by(keys, use_threads=False).aggregate([("sales", "sum"), ("cost", "sum")])
+    totals = totals.filter(pc.or_kleene(pc.greater(totals["sales_sum"], 0), pc.greater(totals["cost_sum"], 0)))
+    totals = totals.sort_by([("report_date", "ascending"), ("billing_entity_id", "ascending")])
+
+    description = list(entity_columns[:3]) + [
+        Column("report_date_day", 1082, None, None, None, None, None),
+        Column("attributed_sales_14_day__sum", 1700, None, None, None, None, None),
+        Column("cost__sum", 1700, None, None, None, None, None),
+    ]
+    return description, table_rows(totals.select(keys + ["sales_sum", "cost_sum"]))
+
+
+# The columns the query reads, with the dated tables limited to the snapshot's range
+SNAPSHOT_TABLES = (
+    SnapshotTable("api_app_campaign", "SELECT id, profile_id FROM api_app_campaign"),
+    SnapshotTable(
+        "api_app_account_integration",
+        "SELECT id, organization_id, active_int FROM api_app_account_integration",
+    ),
+    SnapshotTable(
+        "api_app_account_integration_profiles",
+        """SELECT account_integration_id, profile_id, status, selected_status
+           FROM api_app_account_integration_profiles""",
+    ),
+    SnapshotTable("api_app_organization", "SELECT id, agency_id, name, locked FROM api_app_organization"),
+    SnapshotTable(
+        "api_app_calendar",
+        "SELECT date FROM api_app_calendar WHERE date >= %(start_date)s AND date <= %(end_date)s",
+    ),
+    SnapshotTable(
+        "api_app_currency_conversion",
+        """SELECT date, from_currency_id, to_currency_id, rate
+           FROM api_app_currency_conversion
+           WHERE date >= %(start_date)s AND date <= %(end_date)s""",
+    ),
+    SnapshotTable(
+        "api_app_campaign_fact_redshift",
+        """SELECT report_date, campaign_id, combined_attributed_sales_14_day, cost, currency_code_id
+           FROM api_app_campaign_fact_redshift
+           WHERE report_date >= %(start_date)s AND report_date <= %(end_date)s""",
+    ),
+)
+
+REPORT = register(
+    Report(
+        name="daily_billing_entity_ad_data",
+        query=QUERY,
+        output_dir="daily_billing_entity_ad_data",
+        filename="daily_billing_entity_ad_data_{date}",
+        start_date=datetime(2023, 1, 1),
+        bind=bind_range,
+        split_column="report_date_day",
+        snapshot_tables=SNAPSHOT_TABLES,
+        rollup=rollup,
+    )
+)
@@ -0,0 +1,111 @@
+"""SQL shared by the reports that count ASINs in segment versions.
+
+A version of a migrated (cobalt) segment is excluded from the ASIN counts
+while it is the segment's first live version. Live means created by the
+end of the window and not inactive before its start.
+"""
+
+from ..report import SessionTable, SharedTable
+
+# Every version of a non-demo migrated segment with the time until which an earlier version was still live.
+# Such a version is the segment's first live version in a window once blocked_until <= the window start.
+FIRST_SEGMENT_VERSION = SessionTable(
+    "first_segment_version",
+    """
+SELECT version.version_id,
+       version.segment_id,
+       version.created_at,
+       version.inactive_at,
+       max(CASE
+               WHEN earlier.segment_id IS NOT NULL
+                   THEN coalesce(earlier.inactive_at, '9999-12-31 23:59:59'::timestamp)
+           END) AS blocked_until
+FROM api_app_segment_version version
+         INNER JOIN api_app_segment segment ON (version.segment_id = segment.id)
+         LEFT JOIN api_app_segment_version earlier
+                   ON earlier.segment_id = version.segment_id AND earlier.created_at < version.created_at
+WHERE segment.is_demo = 0
+  AND segment.cobalt_segment_id IS NOT NULL
+GROUP BY version.version_id,
+         version.segment_id,
+         version.created_at,
+         version.inactive_at
+""",
+)
+
+
+def precomputed_first_versions(window_start, window_end):
+    """Version ids of first live versions, read from the ``first_segment_version`` temp table."""
+    return f"""SELECT first_segment_version.version_id
+         FROM first_segment_version
+         WHERE (first_segment_version.inactive_at IS NULL OR
+                first_segment_version.inactive_at > {window_start})
+           AND first_segment_version.created_at <= {window_end}
+           AND (first_segment_version.blocked_until IS NULL OR
+                first_segment_version.blocked_until <= {window_start})"""
+
+
+# Distinct ASINs in each organization's live segment versions for the window from %(window_start)s to
+# %(window_end)s, leaving out products inactivated during the window, products paused since before it in
+# segments that were paused since before it, and first live versions of migrated segments
+SEGMENT_ASIN_USAGE = f"""
+SELECT %(window_start)s::TIMESTAMP AS window_start,
+       %(window_end)s::TIMESTAMP   AS window_end,
+       segment.organization_id,
+       count(DISTINCT sv.product_id) AS asin_count
+FROM api_app_segment_version sv
+         INNER JOIN api_app_segment segment ON (sv.segment_id = segment.id)
+         INNER JOIN api_app_organization org ON org.id = segment.organization_id
+WHERE (segment.is_demo = 0
+    AND (sv.inactive_at IS NULL
+        OR sv.inactive_at > %(window_start)s)
+    AND sv.created_at <= %(window_end)s
+    AND NOT (sv.product_id IN (SELECT DISTINCT inactive_version.product_id
+                               FROM api_app_segment_version inactive_version
+                                        INNER JOIN api_app_segment segment_1
+                                                   ON (inactive_version.segment_id = segment_1.id)
+                               WHERE (segment_1.is_demo = 0
+                                   AND inactive_version.inactive_at >= %(window_start)s
+                                   AND inactive_version.inactive_at <= %(window_end)s)))
+    AND NOT (sv.product_id IN (SELECT DISTINCT paused_version.product_id
+                               FROM api_app_segment_version paused_version
+                                        INNER JOIN api_app_segment segment_2
+                                                   ON (paused_version.segment_id = segment_2.id)
+                               WHERE (segment_2.is_demo = 0
+                                   AND (paused_version.inactive_at IS NULL
+                                       OR paused_version.inactive_at > %(window_start)s)
+                                   AND paused_version.created_at <= %(window_end)s
+                                   AND paused_version.paused_at < %(window_start)s
+                                   AND (paused_version.inactive_at IS NULL
+                                       OR paused_version.inactive_at > %(window_end)s)
+                                   AND NOT (paused_version.version_id IN
+                                            ({precomputed_first_versions("%(window_start)s", "%(window_end)s")}))))
+        AND sv.segment_id IN (SELECT DISTINCT paused_version_1.segment_id
+                              FROM api_app_segment_version paused_version_1
+                                       INNER JOIN api_app_segment segment_5
+                                                  ON (paused_version_1.segment_id = segment_5.id)
+                              WHERE (segment_5.is_demo = 0
+                                  AND (paused_version_1.inactive_at IS NULL
+                                      OR paused_version_1.inactive_at > %(window_start)s)
+                                  AND paused_version_1.created_at <= %(window_end)s
+                                  AND paused_version_1.paused_at < %(window_start)s
+                                  AND (paused_version_1.inactive_at IS NULL
+                                      OR paused_version_1.inactive_at > %(window_end)s)
+                                  AND NOT (paused_version_1.version_id IN
+                                           ({precomputed_first_versions("%(window_start)s", "%(window_end)s")})))))
+    AND NOT (sv.version_id IN ({precomputed_first_versions("%(window_start)s", "%(window_end)s")})))
+GROUP BY segment.organization_id
+"""
+
+
+def segment_asin_usage(bind):
+    """``segment_asin_usage`` for reports whose ``bind`` maps their parameters to the window it counts."""
+    return SharedTable("segment_asin_usage", SEGMENT_ASIN_USAGE, bind, session_tables=(FIRST_SEGMENT_VERSION,))
+
+
+def shared_asin_usage(count_column):
+    """The ``organization_id`` and ASIN count as ``count_column`` of the report's window in ``segment_asin_usage``."""
+    return f"""SELECT organization_id, asin_count AS {count_column}
+                    FROM segment_asin_usage
+                    WHERE window_start = %(window_start)s
+                      AND window_end = %(window_end)s"""
@@ -0,0 +1,29 @@
+"""Helpers for reports that compute their rows in-process instead of on the cluster.
+
+A report's ``rollup`` fetches narrow, unaggregated results once per window
+as Arrow tables and joins and aggregates them with Arrow's vectorized
+kernels, returning the same rows its query would.
+"""
+
+from .writers import arrow_schema, import_pyarrow, record_batch
+
+
+def fetch_table(conn, query, params, fetch_size=10000):
+    """Run ``query`` and return its ``(description, table)``, typed like the Parquet writer types columns."""
+    pa = import_pyarrow()
+    with conn.cursor(name="rollup") as cursor:
+        cursor.itersize = fetch_size
+        cursor.execute(query, params)
+        # Server-side cursors only have a description after a fetch
+        rows = cursor.fetchmany(fetch_size)
+        schema = arrow_schema(pa, cursor.description)
+        batches = []
+        while rows:
+            batches.append(record_batch(pa, schema, rows))
+            rows = cursor.fetchmany(fetch_size)
+        return cursor.description, pa.Table.from_batches(batches, schema)
+
+
+def table_rows(table):
+    """The rows of an Arrow table as tuples of Python values."""
+    return list(zip(*(column.to_pylist() for column in table.columns)))
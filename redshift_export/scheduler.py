@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import Exporter
+
+
+class Scheduler:
+    """Exports several reports together, computing the per-date results they share once.
+
+    Every window of every report is a task. Tasks reading the same
+    ``shared_tables`` rows are grouped and run one after another on one
+    worker, so the rows are materialized once and read over the same
+    connection by every report and period that needs them; a delta
+    export's windows form a single group in date order, since each builds
+    on the previous one. Groups run on up to ``workers`` threads in order
+    of their first date, over the exporters' common ``ConnectionManager``.
+
+    A failed window does not stop the others: the failures are reported
+    together at the end of ``run``.
+    """
+
+    def __init__(self, exporters, workers=1):
+        self.exporters = exporters
+        self.workers = max(1, workers)
+
+    @classmethod
+    def from_env(cls, reports, connections, **overrides):
+        """Schedule ``reports`` with exporters built from the ``EXPORT_*`` settings, reading shared tables."""
+        overrides["shared"] = True
+        exporters = [Exporter.from_env(report, connections=connections, **overrides) for report in reports]
+        return cls(exporters, workers=connections.max_connections)
+
+    def groups(self, plans):
+        """Group the ``(exporter, window)`` tasks of ``plans`` that must or should run one after another."""
+        groups = {}
+        for order, (exporter, windows) in enumerate(plans):
+            for window in windows:
+                if exporter.delta_state:
+                    key = ("delta", order)
+                else:
+                    key = exporter.shared_keys(window) or ("window", order, window[0].start)
+                groups.setdefault(key, []).append((exporter, window))
+        return sorted(groups.values(), key=lambda tasks: min(window[0].start for _, window in tasks))
+
+    def run_group(self, tasks):
+        """Export the ``tasks`` in order, returning ``(report name, written files, error)`` for each."""
+        results = []
+        for exporter, window in tasks:
+            try:
+                results.append((exporter.report.name, exporter.export_window(window), None))
+            except Exception as e:
+                print(f"Exporting {exporter.report.name} for {window[-1].label} failed: {e}")
+                results.append((exporter.report.name, [], e))
+        return results
+
+    def run(self, start_date=None, end_date=None):
+        """Export every report from ``start_date`` to ``end_date`` (by default its own range).
+
+        Returns the files written as ``{report name: [filename, ...]}``.
+        """
+        plans = [(exporter, exporter.plan(start_date, end_date)) for exporter in self.exporters]
+        written = {exporter.report.name: [] for exporter in self.exporters}
+        errors = []
+        try:
+            for exporter, windows in plans:
+                if exporter.plans and windows:
+                    exporter.capture_plan(windows[0])
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for results in executor.map(self.run_group, self.groups(plans)):
+                    for name, filenames, error in results:
+                        written[name].extend(filenames)
+                        if error is not None:
+                            errors.append((name, error))
+        finally:
+            for exporter in self.exporters:
+                exporter.close()
+                exporter.metrics.finish()
+        if errors:
+            names = sorted({name for name, _ in errors})
+            raise RuntimeError(f"Failed to export {', '.join(names)}") from errors[0][1]
+        return written
@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from . import config
+from .cadence import Period
+from .connection import ConnectionManager
+from .engine import Exporter, RowCounter, fetch_batches
+from .manifest import query_hash
+from .report import get_report
+from .writers import Column, write_parquet
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+_DECIMAL = re.compile(r"DECIMAL\((\d+),\s*(\d+)\)")
+
+# Postgres type OIDs of DuckDB result types, so the writers handle snapshot results like the cluster's
+DUCKDB_TYPES = {
+    "BOOLEAN": 16,
+    "BIGINT": 20,
+    "SMALLINT": 21,
+    "INTEGER": 23,
+    "FLOAT": 700,
+    "DOUBLE": 701,
+    "DATE": 1082,
+    "TIMESTAMP": 1114,
+    "TIMESTAMP WITH TIME ZONE": 1184,
+    "HUGEINT": 1700,
+}
+
+
+def import_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("Snapshots are queried with DuckDB (pip install duckdb)") from e
+    return duckdb
+
+
+def duckdb_sql(query):
+    """Rewrite the ``%(name)s`` parameters of a cluster query as DuckDB's ``$name``."""
+    return _PARAM.sub(r"$\1", query).replace("%%", "%")
+
+
+def describe(description):
+    """``cursor.description`` of a DuckDB result in the shape of psycopg2's."""
+    columns = []
+    for name, type_code, *_ in description:
+        match = _DECIMAL.fullmatch(str(type_code))
+        if match:
+            # DuckDB widens sums and products to 38 digits where Postgres returns numeric without a precision
+            precision = int(match.group(1)) if match.group(1) != "38" else None
+            columns.append(Column(name, 1700, None, None, precision, int(match.group(2)), None))
+        else:
+            columns.append(Column(name, DUCKDB_TYPES.get(str(type_code), 25), None, None, None, None, None))
+    return columns
+
+
+class Snapshot:
+    """Local Parquet copy of the source tables a report reads, queried with DuckDB.
+
+    ``take`` copies the report's ``snapshot_tables`` for a date range from
+    the cluster once, and ``execute`` runs queries written for the cluster
+    over the copies, so the report can be re-run or re-aggregated over that
+    range without touching the cluster. ``snapshot.json`` records the range,
+    the row counts and the table queries; a snapshot whose table queries
+    have changed since it was taken must be taken again.
+    """
+
+    def __init__(self, directory, report):
+        if not report.snapshot_tables:
+            raise ValueError(f"Report {report.name!r} has no snapshot tables")
+        self.directory = directory
+        self.report = report
+        self.metadata_path = os.path.join(directory, "snapshot.json")
+        self._database = None
+        self._lock = threading.Lock()
+
+    def path(self, table):
+        return os.path.join(self.directory, f"{table.name}.parquet")
+
+    def take(self, connections, start_date, end_date, fetch_size=10000):
+        """Copy every snapshot table for ``start_date`` to ``end_date`` from the cluster."""
+        params = self.report.params(Period(start_date, end_date))
+        os.makedirs(self.directory, exist_ok=True)
+        # Without its metadata an interrupted snapshot is never mistaken for a complete one
+        if os.path.exists(self.metadata_path):
+            os.remove(self.metadata_path)
+        tables = {}
+        for table in self.report.snapshot_tables:
+
+            def copy():
+                return self.copy_table(connections, table, params, fetch_size)
+
+            print(f"Copying {table.name} into the {self.report.name} snapshot")
+            rows = connections.retry(copy, f"Copying {table.name}")
+            tables[table.name] = {"rows": rows, "query_hash": query_hash(table.query)}
+        metadata = {
+            "report": self.report.name,
+            "start_date": start_date.strftime("%Y-%m-%d"),
+            "end_date": end_date.strftime("%Y-%m-%d"),
+            "taken_at": datetime.now().isoformat(timespec="seconds"),
+            "tables": tables,
+        }
+        tmp = self.metadata_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.metadata_path)
+        return metadata
+
+    def copy_table(self, connections, table, params, fetch_size):
+        filename = self.path(table)
+        tmp = filename + ".tmp"
+        with connections.connection() as conn, conn.cursor(name=f"snapshot_{table.name}") as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(table.query, params)
+            # Server-side cursors only have a description after a fetch
+            first = cursor.fetchmany(fetch_size)
+            batches = RowCounter(fetch_batches(cursor, fetch_size, first))
+            write_parquet(tmp, cursor.description, batches)
+        os.replace(tmp, filename)
+        return batches.rows
+
+    def metadata(self):
+        """The snapshot's ``snapshot.json``, after checking it was taken with the current table queries."""
+        if not os.path.exists(self.metadata_path):
+            raise RuntimeError(f"No complete snapshot of {self.report.name} in {self.directory}, take one first")
+        with open(self.metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        for table in self.report.snapshot_tables:
+            taken = metadata["tables"].get(table.name)
+            if taken is None or taken["query_hash"] != query_hash(table.query):
+                raise RuntimeError(f"The {self.report.name} snapshot's {table.name} table is outdated, take it again")
+        return metadata
+
+    def covers(self, period):
+        metadata = self.metadata()
+        return metadata["start_date"] <= period.start.strftime("%Y-%m-%d") and period.label <= metadata["end_date"]
+
+    def database(self):
+        """In-memory DuckDB database holding the snapshot tables, loaded from their Parquet files."""
+        with self._lock:
+            if self._database is None:
+                self.metadata()
+                database = import_duckdb().connect()
+                for table in self.report.snapshot_tables:
+                    path = self.path(table).replace("'", "''")
+                    database.execute(f"CREATE TABLE {table.name} AS SELECT * FROM read_parquet('{path}')")
+                self._database = database
+            return self._database
+
+    def execute(self, query, params=None):
+        """Run ``query``, written for the cluster, over the snapshot and return the DuckDB cursor.
+
+        Each call gets its own cursor, so queries can run from several
+        threads at once. The result can be fetched like a psycopg2 cursor's
+        or read whole with DuckDB's ``df()`` and ``arrow()``.
+        """
+        params = params or {}
+        names = set(_PARAM.findall(query))
+        cursor = self.database().cursor()
+        return cursor.execute(duckdb_sql(query), {name: params[name] for name in names})
+
+    def close(self):
+        with self._lock:
+            if self._database is not None:
+                self._database.close()
+                self._database = None
+
+
+class SnapshotExporter(Exporter):
+    """``Exporter`` that runs the report's query over a local ``Snapshot`` instead of the cluster.
+
+    Files and manifests are laid out like the cluster's, but under
+    ``<snapshot_dir>/exports`` so output from a possibly stale snapshot never
+    replaces the cluster's exports or counts as current for its incremental
+    runs. Runs without dates export the snapshot's whole range. Periods
+    outside the snapshot's range are refused. The snapshot lives in
+    ``snapshot_dir``, ``<exports_dir>/snapshots/<report name>`` by default.
+    """
+
+    def __init__(self, report, snapshot_dir=None, **options):
+        if options.get("backend", "cursor") != "cursor":
+            raise ValueError("The snapshot engine runs the report's query, set the backend to 'cursor'")
+        if options.get("delta") or options.get("explain"):
+            raise ValueError("The snapshot engine does not support delta exports or EXPLAIN capture")
+        snapshot_dir = snapshot_dir or os.path.join(
+            options.get("exports_dir", config.EXPORTS_DIR), "snapshots", report.name
+        )
+        super().__init__(report, **dict(options, exports_dir=os.path.join(snapshot_dir, "exports")))
+        self.snapshot = Snapshot(snapshot_dir, report)
+
+    @classmethod
+    def from_env(cls, report, **overrides):
+        overrides.setdefault("snapshot_dir", os.getenv("EXPORT_SNAPSHOT_DIR") or None)
+        return super().from_env(report, **overrides)
+
+    def cacheable(self, window):
+        return False
+
+    def close(self):
+        self.snapshot.close()
+        super().close()
+
+    def run(self, start_date=None, end_date=None):
+        metadata = self.snapshot.metadata()
+        start_date = start_date or datetime.strptime(metadata["start_date"], "%Y-%m-%d")
+        end_date = end_date or datetime.strptime(metadata["end_date"], "%Y-%m-%d")
+        return super().run(start_date, end_date)
+
+    def export_window(self, window):
+        span = Period(window[0].start, window[-1].end)
+        print(f"Exporting {self.report.name} for {window[0].label} to {span.label} from its snapshot")
+        written = []
+        try:
+            if not self.snapshot.covers(span):
+                raise ValueError(f"The {self.report.name} snapshot does not cover {window[0].label} to {span.label}")
+            with self.metrics.window(window, "snapshot"):
+                with self.metrics.phase("execute"):
+                    cursor = self.snapshot.execute(self.report.query, self.report.params(span))
+                try:
+                    batches = self.metrics.timed(fetch_batches(cursor, self.fetch_size), "fetch")
+                    self.write_window(window, describe(cursor.description), batches, written)
+                finally:
+                    cursor.close()
+        except Exception:
+            for period in window[len(written):]:
+                self.manifest.record(period.label, status="failed", query_hash=self.output_hash)
+            raise
+        return written
+
+
+def take_snapshot(name, start_date, end_date, snapshot_dir=None):
+    """Snapshot a registered report's source tables using the ``DB_*`` and ``EXPORT_*`` environment settings."""
+    report = get_report(name)
+    if not snapshot_dir:
+        snapshot_dir = os.getenv("EXPORT_SNAPSHOT_DIR") or os.path.join(config.EXPORTS_DIR, "snapshots", name)
+    connections = ConnectionManager.from_env()
+    try:
+        return Snapshot(snapshot_dir, report).take(
+            connections, start_date, end_date, fetch_size=config.env_int("EXPORT_FETCH_SIZE", 10000)
+        )
+    finally:
+        connections.close()
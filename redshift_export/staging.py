@@ -0,0 +1,80 @@
+import re
+
+from .report import SessionTable
+
+# Whitespace and line comments between the parts of a WITH clause
+_GAP = r"(?:\s+|--[^\n]*)*"
+_WITH = re.compile(_GAP + r"with\b", re.IGNORECASE)
+_CTE = re.compile(_GAP + r"(\w+)\s+as\s*\(", re.IGNORECASE)
+_COMMA = re.compile(_GAP + r",")
+
+
+def _closing_paren(sql, open_index):
+    """Index of the parenthesis closing the one at ``open_index``, skipping literals and comments."""
+    depth = 0
+    i = open_index
+    while i < len(sql):
+        if sql.startswith("--", i):
+            i = sql.find("\n", i)
+            if i == -1:
+                break
+        elif sql.startswith("/*", i):
+            i = sql.index("*/", i) + 1
+        elif sql[i] == "'":
+            i += 1
+            while not (sql[i] == "'" and not sql.startswith("''", i)):
+                i += 2 if sql.startswith("''", i) else 1
+        elif sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError("Unbalanced parentheses in query")
+
+
+def split_ctes(query):
+    """Split ``WITH a AS (...), b AS (...) SELECT ...`` into ``[(name, body), ...]`` and the main statement."""
+    match = _WITH.match(query)
+    if not match:
+        return [], query
+    ctes = []
+    position = match.end()
+    while True:
+        cte = _CTE.match(query, position)
+        if not cte:
+            raise ValueError(f"Cannot parse the WITH clause near {query[position:position + 40]!r}")
+        end = _closing_paren(query, cte.end() - 1)
+        ctes.append((cte.group(1), query[cte.end():end]))
+        position = end + 1
+        comma = _COMMA.match(query, position)
+        if not comma:
+            return ctes, query[position:]
+        position = comma.end()
+
+
+def join_ctes(ctes, main):
+    if not ctes:
+        return main
+    return "\nWITH " + ",\n     ".join(f"{name} AS ({body})" for name, body in ctes) + main
+
+
+def stage_invariant_ctes(query):
+    """Move the CTEs that do not depend on the query parameters into session tables.
+
+    A CTE is date-invariant when its body has no ``%(...)s`` parameter and
+    references no parameter-dependent CTE. Each is returned as a
+    ``SessionTable`` named after the CTE, so the rewritten query reads the
+    temp table wherever it used the CTE.
+    """
+    ctes, main = split_ctes(query)
+    staged, kept, dependent = [], [], []
+    for name, body in ctes:
+        if "%(" in body or any(re.search(rf"\b{other}\b", body) for other in dependent):
+            dependent.append(name)
+            kept.append((name, body))
+        else:
+            # Executed without parameters, so escaped percent signs must be unescaped
+            staged.append(SessionTable(name, body.replace("%%", "%")))
+    return tuple(staged), join_ctes(kept, main)
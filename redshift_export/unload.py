@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import os
+import shutil
+from urllib.parse import urlparse
+
+from . import config
+
+BOOLEAN_OID = 16
+
+
+def unload_statement(bound_query, destination, iam_role):
+    """Wrap an already parameter-bound query in a parallel CSV UNLOAD with a verbose manifest."""
+    literal = bound_query.replace("\\", "\\\\").replace("'", "''")
+    return f"""
+UNLOAD ('{literal}')
+TO '{destination}'
+IAM_ROLE '{iam_role}'
+FORMAT AS CSV
+HEADER
+MANIFEST VERBOSE
+ALLOWOVERWRITE
+PARALLEL ON
+"""
+
+
+class LocalStore:
+    """Filesystem stand-in for S3: ``s3://bucket/key`` lives at ``<root>/bucket/key``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, url):
+        parsed = urlparse(url)
+        return os.path.join(self.root, parsed.netloc, parsed.path.lstrip("/"))
+
+    def open(self, url):
+        return open(self.path(url), "rb")
+
+
+class S3Store:
+    """S3 (or an S3-compatible service such as MinIO when ``endpoint_url`` is set)."""
+
+    def __init__(self, endpoint_url=None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("The UNLOAD backend needs boto3 to read from S3 (pip install boto3)") from e
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def open(self, url):
+        parsed = urlparse(url)
+        return self.client.get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip("/"))["Body"]
+
+
+def store_from_env():
+    local_dir = os.getenv("UNLOAD_LOCAL_DIR")
+    if local_dir:
+        return LocalStore(local_dir)
+    return S3Store(os.getenv("UNLOAD_ENDPOINT_URL"))
+
+
+class Unloader:
+    """Runs a report query through ``UNLOAD ... PARALLEL ON`` and reads back the produced parts.
+
+    Each slice writes its own part file, so rows come back in slice order
+    rather than the query's ``ORDER BY``.
+    """
+
+    def __init__(self, store, s3_prefix, iam_role):
+        if not s3_prefix or not iam_role:
+            raise ValueError("The UNLOAD backend needs UNLOAD_S3_PREFIX and UNLOAD_IAM_ROLE")
+        self.store = store
+        self.s3_prefix = s3_prefix.rstrip("/")
+        self.iam_role = iam_role
+
+    @classmethod
+    def from_env(cls):
+        if config.env_flag("UNLOAD_LOCAL_COPY", False):
+            return CopyUnloader(LocalStore(os.getenv("UNLOAD_LOCAL_DIR")), os.getenv("UNLOAD_S3_PREFIX"))
+        return cls(store_from_env(), os.getenv("UNLOAD_S3_PREFIX"), os.getenv("UNLOAD_IAM_ROLE"))
+
+    def unload(self, cursor, query, params, key):
+        """UNLOAD the query to ``<s3_prefix>/<key>/`` and return its manifest."""
+        destination = f"{self.s3_prefix}/{key}/part_"
+        bound_query = cursor.mogrify(query, params).decode("utf-8")
+        cursor.execute(unload_statement(bound_query, destination, self.iam_role))
+        with self.store.open(destination + "manifest") as f:
+            return json.load(f)
+
+    def merge_csv(self, manifest, header, out):
+        """Concatenate the CSV parts into ``out`` (a binary file) below a single header row."""
+        out.write(header.encode("utf-8"))
+        for entry in manifest["entries"]:
+            with self.store.open(entry["url"]) as part:
+                part.readline()  # Every part repeats the header
+                shutil.copyfileobj(part, out)
+        return sum(entry["meta"]["record_count"] for entry in manifest["entries"])
+
+    def read_rows(self, manifest, description=()):
+        """Yield the parts' rows as lists of strings, with empty fields as None.
+
+        Columns ``description`` types as booleans, which the cluster spells
+        ``t`` and ``f``, are read as ``True`` and ``False``.
+        """
+        booleans = [index for index, desc in enumerate(description) if desc[1] == BOOLEAN_OID]
+        for entry in manifest["entries"]:
+            with self.store.open(entry["url"]) as part:
+                reader = csv.reader(io.TextIOWrapper(part, encoding="utf-8", newline=""))
+                next(reader, None)
+                for row in reader:
+                    row = [value if value != "" else None for value in row]
+                    for index in booleans:
+                        if row[index] is not None:
+                            row[index] = row[index] == "t"
+                    yield row
+
+
+class CopyUnloader(Unloader):
+    """Stand-in for ``UNLOAD`` on Postgres, so the backend can run without a cluster or S3.
+
+    The bound query is run with ``COPY ... TO STDOUT WITH CSV HEADER`` and
+    its records are dealt round-robin into ``parts`` part files in a
+    ``LocalStore``, each repeating the header, next to a verbose manifest
+    listing them, the way UNLOAD leaves one part per slice.
+    """
+
+    def __init__(self, store, s3_prefix, parts=4):
+        if not store.root or not s3_prefix:
+            raise ValueError("The UNLOAD stand-in needs UNLOAD_LOCAL_DIR and UNLOAD_S3_PREFIX")
+        self.store = store
+        self.s3_prefix = s3_prefix.rstrip("/")
+        self.iam_role = None
+        self.parts = parts
+
+    def unload(self, cursor, query, params, key):
+        destination = f"{self.s3_prefix}/{key}/part_"
+        bound_query = cursor.mogrify(query, params).decode("utf-8")
+        os.makedirs(os.path.dirname(self.store.path(destination)), exist_ok=True)
+        copied = self.store.path(destination + "copy.tmp")
+        with open(copied, "wb") as out:
+            cursor.copy_expert(f"COPY ({bound_query}) TO STDOUT WITH (FORMAT CSV, HEADER)", out)
+        urls = [f"{destination}{part:04d}_part_00" for part in range(self.parts)]
+        counts = [0] * self.parts
+        with open(copied, "rb") as rows:
+            header = rows.readline()
+            outs = [open(self.store.path(url), "wb") for url in urls]
+            try:
+                for out in outs:
+                    out.write(header)
+                for index, record in enumerate(csv_records(rows)):
+                    outs[index % self.parts].write(record)
+                    counts[index % self.parts] += 1
+            finally:
+                for out in outs:
+                    out.close()
+        os.remove(copied)
+        entries = [
+            {"url": url, "meta": {"content_length": os.path.getsize(self.store.path(url)), "record_count": count}}
+            for url, count in zip(urls, counts)
+        ]
+        manifest = {
+            "entries": entries,
+            "meta": {
+                "content_length": sum(entry["meta"]["content_length"] for entry in entries),
+                "record_count": sum(counts),
+            },
+        }
+        with open(self.store.path(destination + "manifest"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return manifest
+
+
+def csv_records(lines):
+    """Group the lines of CSV bytes into records, joining the lines of quoted values that span several."""
+    record = b""
+    for line in lines:
+        record += line
+        # A quote inside a quoted value is doubled, so the record ends where its quotes balance
+        if record.count(b'"') % 2 == 0:
+            yield record
+            record = b""
+    if record:
+        yield record
+
+
+def csv_header(description):
+    """The CSV header row for ``description``, ended by a bare newline like the rows of UNLOAD's parts."""
+    header = io.StringIO()
+    csv.writer(header, lineterminator="\n").writerow([desc[0] for desc in description])
+    return header.getvalue()
@@ -0,0 +1,155 @@
+import csv
+import gzip
+import io
+from collections import namedtuple
+from functools import partial
+
+# Rows buffered into each Parquet row group
+PARQUET_ROW_GROUP_SIZE = 128 * 1024
+
+# Same fields as psycopg2's cursor.description entries, for descriptions of results from other drivers
+Column = namedtuple("Column", "name type_code display_size internal_size precision scale null_ok")
+
+
+def write_csv(filename, description, batches, opener=open):
+    """Write a header from ``description`` and then every batch of rows."""
+    with opener(filename, "w", newline="", encoding="utf-8") as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow([desc[0] for desc in description])  # Write headers
+        for rows in batches:
+            csv_writer.writerows(rows)  # Write data
+
+
+def open_gzip(filename, mode, level=6, **kwargs):
+    return gzip.open(filename, mode + "t", compresslevel=level, **kwargs)
+
+
+def import_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd output needs zstandard (pip install zstandard)") from e
+    return zstandard
+
+
+def open_zstd(filename, mode, level=3, **kwargs):
+    raw = open(filename, mode + "b")
+    return io.TextIOWrapper(import_zstandard().ZstdCompressor(level=level).stream_writer(raw), **kwargs)
+
+
+def open_csv_bytes(filename, output_format, level=None):
+    """Open ``filename`` for already encoded CSV bytes, compressed as ``output_format`` says."""
+    if output_format == "csv":
+        return open(filename, "wb")
+    if output_format == "csv.gz":
+        return gzip.open(filename, "wb", compresslevel=6 if level is None else level)
+    if output_format == "csv.zst":
+        compressor = import_zstandard().ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(open(filename, "wb"))
+    raise ValueError(f"{output_format!r} is not a CSV format, expected one of {CSV_FORMATS}")
+
+
+def write_csv_gzip(filename, description, batches, level=6):
+    write_csv(filename, description, batches, opener=partial(open_gzip, level=level))
+
+
+def write_csv_zstd(filename, description, batches, level=3):
+    write_csv(filename, description, batches, opener=partial(open_zstd, level=level))
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("Parquet and Arrow output need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def arrow_type(pa, column):
+    """Arrow type for a ``cursor.description`` column, keyed on its Postgres/Redshift type OID."""
+    types = {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }
+    if column.type_code == 1700:
+        # Aggregates such as sum() have no declared precision, so fall back to float64 for them
+        if column.precision and column.scale is not None and 0 < column.precision <= 38:
+            return pa.decimal128(column.precision, column.scale)
+        return pa.float64()
+    return types.get(column.type_code, pa.string())
+
+
+def arrow_schema(pa, description):
+    return pa.schema([pa.field(column.name, arrow_type(pa, column)) for column in description])
+
+
+def record_batch(pa, schema, rows):
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        try:
+            arrays.append(pa.array(values, type=field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            # Text rows (e.g. read back from UNLOAD parts) are parsed by Arrow's casts
+            arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()).cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(filename, description, batches):
+    """Write row batches as Parquet, flushing a row group every ``PARQUET_ROW_GROUP_SIZE`` rows."""
+    pa = import_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(pa, description)
+    with pq.ParquetWriter(filename, schema) as writer:
+        pending, pending_rows = [], 0
+        for rows in batches:
+            pending.append(record_batch(pa, schema, rows))
+            pending_rows += len(rows)
+            if pending_rows >= PARQUET_ROW_GROUP_SIZE:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=pending_rows)
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=pending_rows)
+
+
+def write_arrow(filename, description, batches):
+    """Write row batches as an Arrow IPC file, one record batch per fetched batch."""
+    pa = import_pyarrow()
+
+    schema = arrow_schema(pa, description)
+    with pa.OSFile(filename, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for rows in batches:
+            writer.write_batch(record_batch(pa, schema, rows))
+
+
+WRITERS = {
+    "csv": (".csv", write_csv),
+    "csv.gz": (".csv.gz", write_csv_gzip),
+    "csv.zst": (".csv.zst", write_csv_zstd),
+    "parquet": (".parquet", write_parquet),
+    "arrow": (".arrow", write_arrow),
+}
+
+# Formats whose writer takes a ``level`` argument
+COMPRESSED_FORMATS = ("csv.gz", "csv.zst")
+
+# Formats that hold CSV text, so CSV rendered elsewhere can be written to them as is
+CSV_FORMATS = ("csv", "csv.gz", "csv.zst")
+
+
+def get_writer(output_format, compression_level=None):
+    """Return the ``(extension, write)`` pair for an output format."""
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(WRITERS)}")
+    extension, write = WRITERS[output_format]
+    if compression_level is not None and output_format in COMPRESSED_FORMATS:
+        write = partial(write, level=compression_level)
+    return extension, write
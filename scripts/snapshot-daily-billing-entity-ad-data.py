@@ -0,0 +1,16 @@
+"""Copy the tables the billing entity ad report reads for a date range into a local snapshot.
+
+    python scripts/snapshot-daily-billing-entity-ad-data.py 2024-01-01 2024-03-31
+    EXPORT_ENGINE=snapshot python scripts/export-daily-billing-entity-ad-data.py
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redshift_export import take_snapshot  # noqa: E402
+
+start_date, end_date = (datetime.strptime(arg, "%Y-%m-%d") for arg in sys.argv[1:3])
+take_snapshot("daily_billing_entity_ad_data", start_date, end_date)